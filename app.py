@@ -1,18 +1,51 @@
 import streamlit as st
-from supabase import create_client, Client
+import contextvars
+import functools
+import itertools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
+import plotly.express as px
 from datetime import datetime, date, time
 from dateutil.relativedelta import relativedelta
 from fpdf import FPDF
+from streamlit.errors import StreamlitAPIException
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from streamlit.runtime.scriptrunner_utils.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+from importacao import ler_planilha, importar, exportar, COLUNAS_IMPORTACAO, OBRIGATORIAS
+from repositorio import Repositorio, ClienteMedido, HistogramaLatencia, criar_cliente_supabase, banco_local, iniciar_execucao, log_consultas, FAIXAS_VENCIMENTO, ERROS_BANCO
 
 # --- CONFIGURAÇÃO DA PÁGINA ---
 st.set_page_config(page_title="Luna Alencar Advogados", layout="wide", page_icon="⚖️")
 
 # --- CONEXÃO COM O BANCO DE DADOS ---
+@st.cache_resource
+def conectar_supabase(url, key, timeout, max_conexoes):
+    # Streamlit reexecuta o script a cada interação; o cliente e o pool HTTP (keep-alive)
+    # são criados uma vez por processo e reaproveitados por todas as sessões.
+    return ClienteMedido(criar_cliente_supabase(url, key, timeout, max_conexoes), HistogramaLatencia())
+
+@st.cache_resource
+def conectar_banco_local(caminho):
+    # Mesmo esquema em SQLite (repositorio.BancoLocal): desenvolvimento e benchmarks sem projeto Supabase
+    return ClienteMedido(banco_local(caminho), HistogramaLatencia())
+
+@st.cache_resource
+def ativar_log_consultas():
+    # Uma linha JSON por consulta na saída padrão (logs estruturados)
+    saida = logging.StreamHandler(); saida.setFormatter(logging.Formatter("%(message)s"))
+    log_consultas.addHandler(saida); log_consultas.setLevel(logging.INFO)
+
 try:
-    url = st.secrets["SUPABASE_URL"]
-    key = st.secrets["SUPABASE_KEY"]
-    supabase: Client = create_client(url, key)
+    if st.secrets.get("BANCO_LOCAL"):
+        supabase = conectar_banco_local(st.secrets["BANCO_LOCAL"])
+    else:
+        url = st.secrets["SUPABASE_URL"]
+        key = st.secrets["SUPABASE_KEY"]
+        supabase = conectar_supabase(url, key, float(st.secrets.get("SUPABASE_TIMEOUT", 10)), int(st.secrets.get("SUPABASE_MAX_CONEXOES", 20)))
+    repo = Repositorio(supabase)
+    if st.secrets.get("LOG_CONSULTAS"): ativar_log_consultas(); supabase.registro.medir_tamanho = True
 except:
     st.warning("⚠️ Erro de Conexão: Verifique se as SEGRETS (URL e KEY) estão configuradas no Streamlit.")
     st.stop()
@@ -143,60 +176,96 @@ def mostrar_cabecalho():
     st.write("")
 
 # --- GERADORES DE PDF ---
-def gerar_pdf_caixa(dados_caixa, data_escolhida):
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=14)
-    data_str = data_escolhida.strftime('%d/%m/%Y')
-    pdf.cell(200, 10, txt=f"Movimento de Caixa - {data_str}", ln=True, align='C')
-    pdf.ln(5)
-    
-    pdf.set_font("Arial", 'B', 10)
-    pdf.cell(25, 10, "Data", 1); pdf.cell(20, 10, "Tipo", 1); pdf.cell(65, 10, "Descricao", 1)
-    pdf.cell(30, 10, "Usuario", 1); pdf.cell(25, 10, "Valor", 1); pdf.ln()
-    
-    pdf.set_font("Arial", size=9)
+def texto_pdf(valor, max_chars=None):
+    # As fontes padrão do FPDF só aceitam latin-1
+    txt = "" if valor is None else str(valor)
+    if max_chars: txt = txt[:max_chars]
+    return txt.encode('latin-1', 'replace').decode('latin-1')
+
+class RelatorioPDF(FPDF):
+    # Tabela que atravessa páginas: título e cabeçalho das colunas se repetem em cada página.
+    # colunas: [(rótulo, largura, máx. de caracteres)]
+    ALTURA_LINHA = 8
+
+    def __init__(self, titulo, colunas, orientacao='P'):
+        super().__init__(orientacao)
+        self.titulo = titulo; self.colunas = colunas
+        self.set_auto_page_break(True, margin=15); self.alias_nb_pages()
+        self.add_page()
+
+    def header(self):
+        self.set_text_color(0, 0, 0); self.set_font("Arial", size=14)
+        self.cell(0, 10, texto_pdf(self.titulo), ln=True, align='C'); self.ln(2)
+        self._cabecalho_colunas()
+
+    def _cabecalho_colunas(self):
+        self.set_text_color(0, 0, 0); self.set_font("Arial", 'B', 10)
+        for rotulo, largura, max_chars in self.colunas: self.cell(largura, self.ALTURA_LINHA, texto_pdf(rotulo, max_chars), 1)
+        self.ln(); self.set_font("Arial", size=9)
+
+    def tabela(self, colunas):
+        # Começa outra tabela no mesmo documento; as páginas seguintes repetem as novas colunas
+        self.colunas = colunas; self.ln(4)
+        if self.get_y() + 2 * self.ALTURA_LINHA > self.page_break_trigger: self.add_page()
+        else: self._cabecalho_colunas()
+
+    def footer(self):
+        self.set_y(-12); self.set_text_color(0, 0, 0); self.set_font("Arial", size=8)
+        self.cell(0, 8, texto_pdf(f"Página {self.page_no()}/{{nb}}"), align='C')
+
+    def linha(self, valores, cor=(0, 0, 0)):
+        # Quebra antes da linha para não dividi-la entre páginas
+        if self.get_y() + self.ALTURA_LINHA > self.page_break_trigger: self.add_page()
+        self.set_text_color(*cor)
+        for (_, largura, max_chars), valor in zip(self.colunas, valores):
+            self.cell(largura, self.ALTURA_LINHA, texto_pdf(valor, max_chars), 1)
+        self.ln()
+
+    def rodape_total(self, texto):
+        self.set_text_color(0, 0, 0); self.ln(6); self.set_font("Arial", 'B', 11)
+        self.cell(0, 10, texto_pdf(texto), ln=True)
+
+    def bytes(self):
+        return self.output(dest='S').encode('latin-1')
+
+def gerar_pdf_caixa(movimentos, inicio, fim=None):
+    # movimentos: qualquer iterável (ex.: iterar_caixa_periodo), consumido linha a linha
+    fim = fim or inicio
+    periodo = inicio.strftime('%d/%m/%Y') if inicio == fim else f"{inicio.strftime('%d/%m/%Y')} a {fim.strftime('%d/%m/%Y')}"
+    pdf = RelatorioPDF(f"Movimento de Caixa - {periodo}", [("Data", 25, None), ("Tipo", 20, None), ("Descricao", 65, 35), ("Usuario", 30, 12), ("Valor", 25, None)])
     total_ent = 0; total_sai = 0
-    
-    for item in dados_caixa:
-        data_mov = pd.to_datetime(item['data_movimentacao']).strftime('%d/%m/%Y')
-        user = item.get('usuario_responsavel', '')[:12]
-        desc = item['descricao'][:35].encode('latin-1', 'replace').decode('latin-1')
+    for item in movimentos:
         val = float(item['valor'])
-        
-        if item['tipo'] == 'Entrada':
-            total_ent += val; pdf.set_text_color(0, 100, 0)
-        else:
-            total_sai += val; pdf.set_text_color(200, 0, 0)
-            
-        pdf.cell(25, 10, data_mov, 1); pdf.cell(20, 10, item['tipo'], 1); pdf.cell(65, 10, desc, 1)
-        pdf.cell(30, 10, user, 1); pdf.cell(25, 10, f"{val:.2f}", 1); pdf.ln()
-    
-    pdf.set_text_color(0,0,0); pdf.ln(10); pdf.set_font("Arial", 'B', 11)
-    pdf.cell(200, 10, f"SALDO DO DIA: R$ {total_ent - total_sai:.2f}", ln=True)
-    return pdf.output(dest='S').encode('latin-1')
-
-def gerar_pdf_agenda(dados_agenda, mes, ano):
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=14)
-    pdf.cell(200, 10, txt=f"Agendamentos - {mes}/{ano}", ln=True, align='C')
-    pdf.ln(5)
-    
-    pdf.set_font("Arial", 'B', 10)
-    pdf.cell(35, 10, "Data/Hora", 1); pdf.cell(60, 10, "Cliente", 1)
-    pdf.cell(50, 10, "Evento", 1); pdf.cell(45, 10, "Local", 1); pdf.ln()
-    
-    pdf.set_font("Arial", size=9)
-    for item in dados_agenda:
-        dh = pd.to_datetime(item['data_hora']).strftime('%d/%m %H:%M')
-        cli = item['processos']['clientes']['nome'][:25].encode('latin-1', 'replace').decode('latin-1')
-        evento = item['tipo_evento'][:20].encode('latin-1', 'replace').decode('latin-1')
-        local = item.get('local_cidade', '')[:20].encode('latin-1', 'replace').decode('latin-1')
-        
-        pdf.cell(35, 10, dh, 1); pdf.cell(60, 10, cli, 1)
-        pdf.cell(50, 10, evento, 1); pdf.cell(45, 10, local, 1); pdf.ln()
-    return pdf.output(dest='S').encode('latin-1')
+        if item['tipo'] == 'Entrada': total_ent += val; cor = (0, 100, 0)
+        else: total_sai += val; cor = (200, 0, 0)
+        pdf.linha([formatar_data(item['data_movimentacao']), item['tipo'], item['descricao'], item.get('usuario_responsavel') or '', f"{val:.2f}"], cor)
+    pdf.rodape_total(f"SALDO DO {'DIA' if inicio == fim else 'PERIODO'}: R$ {total_ent - total_sai:.2f}")
+    return pdf.bytes()
+
+COLUNAS_TOTAIS_DIA = ['Entradas', 'Saídas', 'Saldo do dia', 'Saldo acumulado']
+
+def gerar_pdf_relatorio_caixa(saldo_inicial, df_dias, df_formas, inicio, fim):
+    # Paisagem: uma coluna com o líquido de cada forma de pagamento antes dos totais do dia
+    formas = [c for c in df_dias.columns if c not in ['Dia'] + COLUNAS_TOTAIS_DIA]
+    largura = min(30, 127 / max(len(formas), 1))
+    colunas = [("Dia", 25, None)] + [(forma, largura, int(largura / 2)) for forma in formas] + [("Entradas", 30, None), ("Saidas", 30, None), ("Saldo do dia", 30, None), ("Saldo acumulado", 35, None)]
+    pdf = RelatorioPDF(f"Relatorio de Caixa - {inicio.strftime('%d/%m/%Y')} a {fim.strftime('%d/%m/%Y')}", colunas, 'L')
+    pdf.linha(["Anterior"] + [""] * (len(formas) + 3) + [f"{saldo_inicial:.2f}"])
+    for dia in df_dias.to_dict('records'):
+        pdf.linha([dia['Dia']] + [f"{dia[c]:.2f}" for c in formas + COLUNAS_TOTAIS_DIA], (0, 100, 0) if dia['Saldo do dia'] >= 0 else (200, 0, 0))
+    saldo_final = saldo_inicial + df_formas['Líquido'].sum()
+    pdf.rodape_total(f"SALDO INICIAL: R$ {saldo_inicial:.2f}   SALDO FINAL: R$ {saldo_final:.2f}")
+    pdf.tabela([("Forma de pagamento", 60, 30), ("Entradas", 35, None), ("Saidas", 35, None), ("Liquido", 35, None), ("Movimentos", 25, None)])
+    for forma in df_formas.to_dict('records'):
+        pdf.linha([forma['Forma de pagamento'], f"{forma['Entradas']:.2f}", f"{forma['Saídas']:.2f}", f"{forma['Líquido']:.2f}", forma['Movimentos']])
+    return pdf.bytes()
+
+def gerar_pdf_agenda(agendamentos, mes, ano):
+    pdf = RelatorioPDF(f"Agendamentos - {mes}/{ano}", [("Data/Hora", 35, None), ("Cliente", 60, 25), ("Evento", 50, 20), ("Local", 45, 20)])
+    for item in agendamentos:
+        cli = ((item.get('processos') or {}).get('clientes') or {}).get('nome', '')
+        pdf.linha([pd.to_datetime(item['data_hora']).strftime('%d/%m %H:%M'), cli, item['tipo_evento'], item.get('local_cidade') or ''])
+    return pdf.bytes()
 
 # --- FUNÇÕES ÚTEIS ---
 def formatar_data(data_iso):
@@ -207,6 +276,235 @@ def formatar_data_hora(data_iso):
     if not data_iso: return ""
     return pd.to_datetime(data_iso).strftime('%d/%m/%Y %H:%M')
 
+# --- CACHE DE CONSULTAS ---
+# Cada chave ('clientes', 'busca', 'caixa', 'processos', 'processos:<cliente_id>', 'usuario:<id>', ...) tem uma versão
+# compartilhada entre todas as sessões. As funções em cache recebem a versão como
+# argumento; uma escrita troca a versão só das chaves afetadas, e a próxima leitura
+# vai ao banco em vez de mostrar dado antigo.
+@st.cache_resource
+def _versoes_cache():
+    return {}, itertools.count(1)
+
+def versao_cache(chave):
+    return _versoes_cache()[0].get(chave, 0)
+
+def invalidar_cache(*chaves):
+    versoes, contador = _versoes_cache()
+    for chave in chaves: versoes[chave] = next(contador)
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _listar_clientes(versao):
+    return repo.listar_clientes()
+
+def listar_clientes():
+    return _listar_clientes(versao_cache('clientes'))
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _listar_processos_cliente(cliente_id, versao, versao_global):
+    return repo.listar_processos_cliente(cliente_id)
+
+def listar_processos_cliente(cliente_id):
+    # 'processos' vale para todos os clientes de uma vez (importação em lote)
+    return _listar_processos_cliente(cliente_id, versao_cache(f"processos:{cliente_id}"), versao_cache('processos'))
+
+@st.cache_data(ttl=600, show_spinner=False)
+def _obter_usuario(usuario_id, versao):
+    # Só id e nome: a senha não entra no cache (Meus Dados nunca a lê, só grava a nova)
+    return repo.obter_usuario(usuario_id)
+
+def obter_usuario(usuario_id):
+    return _obter_usuario(usuario_id, versao_cache(f"usuario:{usuario_id}"))
+
+# --- MEDIÇÃO POR EXECUÇÃO ---
+_em_fragmento = contextvars.ContextVar("em_fragmento", default=False)
+
+def fragmento(fn):
+    # st.fragment que, ao reexecutar sozinho, abre uma nova execução na medição de consultas
+    # (os fragmentos internos de um fragmento em execução continuam na mesma)
+    @functools.wraps(fn)
+    def executar(*args, **kwargs):
+        ctx = get_script_run_ctx()
+        if ctx and ctx.fragment_ids_this_run and not _em_fragmento.get():
+            iniciar_execucao(f"{st.session_state.get('page', 'menu')} › {fn.__name__}")
+        token = _em_fragmento.set(True)
+        try: return fn(*args, **kwargs)
+        finally: _em_fragmento.reset(token)
+    return st.fragment(executar)
+
+# --- CONSULTAS EM PARALELO ---
+@st.cache_resource
+def _executor_consultas():
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="consulta")
+
+def buscar_em_paralelo(**consultas):
+    # Dispara as consultas independentes ao mesmo tempo e espera todas:
+    # a tela leva o tempo da mais lenta, não a soma. Devolve {nome: resultado}.
+    ctx = get_script_run_ctx()
+    def executar(fn):
+        thread = threading.current_thread(); anterior = getattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, None)
+        add_script_run_ctx(thread, ctx)  # permite st.cache_data dentro da thread
+        # A thread volta ao pool: não pode ficar presa à sessão (e ao rerun) que a usou por último
+        try: return fn()
+        finally: setattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, anterior)
+    # Cada thread roda numa cópia do contexto, para as consultas contarem na execução atual
+    futuros = {nome: _executor_consultas().submit(contextvars.copy_context().run, executar, fn) for nome, fn in consultas.items()}
+    return {nome: futuro.result() for nome, futuro in futuros.items()}
+
+# --- CONSULTAS AO BANCO ---
+TAMANHO_PAGINA_BUSCA = 20
+MIN_CARACTERES_BUSCA = 3
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _buscar_clientes_com_processos(termo, limite, versao):
+    return repo.buscar_clientes(termo, limite)
+
+def buscar_clientes_com_processos(termo, limite=TAMANHO_PAGINA_BUSCA):
+    return _buscar_clientes_com_processos(termo, limite, versao_cache('busca'))
+
+def buscar_cliente_com_processos(cliente_id):
+    return repo.cliente_com_processos(cliente_id)
+
+# Agenda do mês e caixa do dia ficam numa cópia local por sessão (repositorio.VisaoIncremental):
+# cada rerun traz do banco só o que outras pessoas (ou esta) mudaram desde a última leitura.
+def dados_visao(nome, visao):
+    atual = st.session_state.get(f"visao_{nome}")
+    if atual is None or atual.chave != visao.chave: st.session_state[f"visao_{nome}"] = atual = visao
+    return repo.atualizar_visao(atual)
+
+def buscar_agendamentos_mes(mes, ano):
+    return dados_visao('agenda', repo.visao_agendamentos_mes(mes, ano))
+
+# PDFs prontos ficam em cache pela chave (relatório, período, versão dos dados):
+# clicar de novo não refaz o documento enquanto ninguém gravar na tabela.
+@st.cache_data(ttl=3600, max_entries=20, show_spinner="Gerando PDF...")
+def _pdf_agenda(mes, ano, versao):
+    return gerar_pdf_agenda(repo.iterar_agendamentos_mes(mes, ano), mes, ano)
+
+def pdf_agenda(mes, ano):
+    return _pdf_agenda(mes, ano, versao_cache('agendamentos'))
+
+@st.cache_data(ttl=3600, max_entries=20, show_spinner="Gerando PDF...")
+def _pdf_caixa(inicio, fim, versao):
+    return gerar_pdf_caixa(repo.iterar_caixa_periodo(inicio, fim), inicio, fim)
+
+def pdf_caixa(inicio, fim):
+    return _pdf_caixa(inicio, fim, versao_cache('caixa'))
+
+def montar_df_agenda(dados):
+    df = pd.DataFrame(dados)
+    df['Data'] = pd.to_datetime(df['data_hora'], format='ISO8601').dt.strftime('%d/%m/%Y %H:%M')
+    df['Cliente'] = df['processos'].str.get('clientes').str.get('nome')
+    df['Status'] = df['status_comparecimento'].fillna('Pendente')
+    return df
+
+def buscar_caixa_periodo(inicio, fim):
+    return dados_visao('caixa', repo.visao_caixa_periodo(inicio, fim))
+
+def totais_caixa(df):
+    # Entradas e saídas numa única passada (soma agrupada por tipo)
+    somas = pd.to_numeric(df['valor']).groupby(df['tipo']).sum()
+    tot_ent = float(somas.get('Entrada', 0)); tot_sai = float(somas.get('Saída', 0))
+    return tot_ent, tot_sai, tot_ent - tot_sai
+
+# Relatório por período: saldo de abertura e totais diários vêm de caixa_saldos_diarios
+# (mantida por gatilho no banco), então 12 meses leem no máximo uma linha por dia e forma
+# de pagamento em vez de todos os movimentos.
+@st.cache_data(ttl=300, show_spinner=False)
+def _relatorio_caixa(inicio, fim, versao):
+    res = buscar_em_paralelo(saldo_inicial=lambda: repo.saldo_caixa_ate(inicio), linhas=lambda: repo.saldos_diarios(inicio, fim))
+    return res['saldo_inicial'], res['linhas']
+
+def relatorio_caixa(inicio, fim):
+    return _relatorio_caixa(inicio, fim, versao_cache('caixa'))
+
+def montar_relatorio_caixa(saldo_inicial, linhas):
+    # Devolve (um registro por dia com o líquido de cada forma, entradas, saídas e saldo acumulado; totais por forma)
+    df = pd.DataFrame(linhas, columns=['dia', 'forma_pagamento', 'entradas', 'saidas', 'movimentos'])
+    df[['entradas', 'saidas']] = df[['entradas', 'saidas']].apply(pd.to_numeric)
+    df['liquido'] = df['entradas'] - df['saidas']
+    dias = df.pivot_table(index='dia', columns='forma_pagamento', values='liquido', aggfunc='sum', fill_value=0)
+    totais = df.groupby('dia')[['entradas', 'saidas']].sum()
+    dias['Entradas'] = totais['entradas']; dias['Saídas'] = totais['saidas']
+    dias['Saldo do dia'] = dias['Entradas'] - dias['Saídas']
+    dias['Saldo acumulado'] = saldo_inicial + dias['Saldo do dia'].cumsum()
+    dias.index = pd.to_datetime(dias.index).strftime('%d/%m/%Y'); dias.index.name = 'Dia'; dias.columns.name = None
+    formas = df.groupby('forma_pagamento')[['entradas', 'saidas', 'liquido', 'movimentos']].sum().reset_index()
+    formas.columns = ['Forma de pagamento', 'Entradas', 'Saídas', 'Líquido', 'Movimentos']
+    return dias.reset_index(), formas
+
+def csv_relatorio_caixa(saldo_inicial, df_dias):
+    # Planilha fechada em si: linha do saldo anterior, os dias e a linha de totais (inclusive por forma)
+    anterior = pd.DataFrame([{'Dia': 'Saldo anterior', 'Saldo acumulado': saldo_inicial}])
+    total = df_dias.drop(columns=['Dia', 'Saldo acumulado']).sum().to_frame().T
+    total.insert(0, 'Dia', 'Total'); total['Saldo acumulado'] = saldo_inicial + total['Saldo do dia']
+    return pd.concat([anterior, df_dias, total], ignore_index=True)[df_dias.columns].to_csv(index=False, sep=';', decimal=',').encode('utf-8-sig')
+
+@st.cache_data(ttl=3600, max_entries=20, show_spinner="Gerando PDF...")
+def _pdf_relatorio_caixa(inicio, fim, versao):
+    saldo_inicial, linhas = _relatorio_caixa(inicio, fim, versao)
+    return gerar_pdf_relatorio_caixa(saldo_inicial, *montar_relatorio_caixa(saldo_inicial, linhas), inicio, fim)
+
+def pdf_relatorio_caixa(inicio, fim):
+    return _pdf_relatorio_caixa(inicio, fim, versao_cache('caixa'))
+
+def montar_parcelas(saldo, qtd_parcelas, vencimento_inicial):
+    # Cronograma inteiro em memória; a diferença de arredondamento vai para a última parcela
+    val_p = round(saldo / qtd_parcelas, 2); diff = round(saldo - (val_p * qtd_parcelas), 2)
+    parcelas = []
+    for i in range(qtd_parcelas):
+        valor_desta = val_p + diff if i == qtd_parcelas - 1 else val_p; data_venc = vencimento_inicial + relativedelta(months=i)
+        parcelas.append({"numero_parcela": i+1, "valor_parcela": valor_desta, "data_vencimento": str(data_venc)})
+    return parcelas
+
+OPCOES_GESTAO = ["Parcelas Fixas (Promissórias)", "Recibos 30% (Auxílio/Recorrente)"]
+TAMANHO_PAGINA_PARCELAS = 20
+
+def buscar_parcelas_pendentes(faixa, cursor=None, limite=TAMANHO_PAGINA_PARCELAS):
+    return repo.parcelas_pendentes(faixa, cursor, limite)
+
+def resumo_parcelas_pendentes():
+    return repo.resumo_parcelas_pendentes(date.today())
+
+def baixar_parcelas(ids, forma_pagamento):
+    qtd = repo.baixar_parcelas(ids, forma_pagamento, st.session_state['usuario']['usuario'])
+    invalidar_cache('caixa')
+    return qtd
+
+# Resumo gerado pelo worker_lembretes.py (próximas perícias/avaliações e parcelas vencidas)
+@st.cache_data(ttl=60, show_spinner=False)
+def buscar_resumo_lembretes():
+    return repo.resumo_lembretes()
+
+# Indicadores do painel do menu: um único RPC com os agregados prontos (função painel_indicadores)
+FAIXAS_ATRASO = ["A vencer", "1-30 dias", "31-60 dias", "61-90 dias", "Mais de 90 dias"]
+
+@st.cache_data(ttl=120, show_spinner=False)
+def buscar_painel_indicadores(hoje):
+    return repo.painel_indicadores(hoje)
+
+# Etiquetas coloridas exibidas no título de cada cliente
+TAGS_STATUS = {
+    "Documentos": " :red[⛔ FALTA DOCS]",
+    "Em Análise": " ⚪ EM ANÁLISE",
+    "Concedido": " :green[✅ CONCEDIDO]",
+    "Indeferido": " :red[❌ INDEFERIDO]",
+    "Em Exigência": " :orange[⚠️ EXIGÊNCIA]",
+}
+
+def montar_tags_status(status_geral, processos):
+    tags_visuais = ""
+    if status_geral == 'Arquivado':
+        tags_visuais += " :grey[🗄️ ARQUIVADO]"
+    for p in processos:
+        tags_visuais += TAGS_STATUS.get(p['status_processo'], "")
+    return tags_visuais
+
+def recarregar_fragmento():
+    # Reexecuta só o fragmento atual; se a execução em andamento for da página
+    # inteira (o Streamlit não aceita scope="fragment" nesse caso), recarrega tudo.
+    try: st.rerun(scope="fragment")
+    except StreamlitAPIException: st.rerun()
+
 # --- TELAS DO SISTEMA ---
 
 def tela_menu_principal():
@@ -236,10 +534,57 @@ def tela_menu_principal():
         if st.button("🔒\n\nMEUS DADOS", key="bt_pass"): st.session_state['page'] = 'meus_dados'; st.rerun()
         
     st.write(""); st.divider()
+    painel_lembretes()
+    painel_indicadores()
     c_s1, c_s2, c_s3 = st.columns([1,1,1])
     with c_s2:
         if st.button("SAIR DO SISTEMA", type="primary", use_container_width=True): st.session_state.clear(); st.rerun()
 
+MAX_LEMBRETES_MENU = 5
+
+def painel_lembretes():
+    try: lembretes = buscar_resumo_lembretes()
+    except: lembretes = []  # resumo ainda não criado: o menu segue sem o painel
+    if not lembretes: return
+    agendamentos = [l for l in lembretes if l['tipo'] == 'agendamento']; parcelas = [l for l in lembretes if l['tipo'] == 'parcela']
+    c1, c2 = st.columns(2)
+    with c1.container(border=True):
+        st.markdown(f"**🩺 Próximas perícias / avaliações ({len(agendamentos)})**")
+        for l in agendamentos[:MAX_LEMBRETES_MENU]: st.write(f"{formatar_data_hora(l['data'])} | {l['cliente']} | {l['descricao']}")
+        if len(agendamentos) > MAX_LEMBRETES_MENU: st.caption(f"e mais {len(agendamentos) - MAX_LEMBRETES_MENU} na Agenda")
+    with c2.container(border=True):
+        st.markdown(f"**💸 Parcelas vencidas (R$ {sum(float(l['valor'] or 0) for l in parcelas):.2f})**")
+        for l in parcelas[:MAX_LEMBRETES_MENU]: st.write(f":red[{formatar_data(l['data'])}] | {l['cliente']} | {l['descricao']} | R$ {float(l['valor'] or 0):.2f}")
+        if len(parcelas) > MAX_LEMBRETES_MENU: st.caption(f"e mais {len(parcelas) - MAX_LEMBRETES_MENU} clientes no Financeiro")
+    st.caption(f"Atualizado em {formatar_data_hora(lembretes[0]['gerado_em'])}")
+    st.divider()
+
+def painel_indicadores():
+    try: ind = buscar_painel_indicadores(date.today())
+    except: return
+    procs = pd.DataFrame(ind['processos'], columns=['status_processo', 'esfera', 'tipo_beneficio', 'quantidade'])
+    por_status = procs.groupby('status_processo')['quantidade'].sum()
+    aging = pd.DataFrame(ind['parcelas'], columns=['ordem', 'quantidade', 'valor'])
+    aging['Faixa'] = aging['ordem'].map(dict(enumerate(FAIXAS_ATRASO)))
+    caixa = pd.DataFrame(ind['caixa_mensal'], columns=['mes', 'entradas', 'saidas'])
+    caixa['Mês'] = pd.to_datetime(caixa['mes']).dt.strftime('%m/%Y')
+
+    st.markdown("<h4 style='text-align: center; font-weight: 300;'>Indicadores</h4>", unsafe_allow_html=True)
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Em Exigência", int(por_status.get('Em Exigência', 0)))
+    m2.metric("Falta Documentos", int(por_status.get('Documentos', 0)))
+    m3.metric(f"Vencidas no mês ({ind['vencidas_mes']['quantidade']})", f"R$ {float(ind['vencidas_mes']['valor']):.2f}")
+    m4.metric("Total a receber", f"R$ {float(aging['valor'].sum()):.2f}")
+    g1, g2 = st.columns(2)
+    if not procs.empty:
+        g1.plotly_chart(px.bar(procs.groupby(['status_processo', 'esfera'], as_index=False)['quantidade'].sum(), x='status_processo', y='quantidade', color='esfera', title="Processos por situação", labels={'status_processo': '', 'quantidade': 'Processos', 'esfera': 'Esfera'}), use_container_width=True)
+        g2.plotly_chart(px.pie(procs.groupby('tipo_beneficio', as_index=False)['quantidade'].sum(), names='tipo_beneficio', values='quantidade', title="Processos por benefício", hole=0.4), use_container_width=True)
+    if not aging.empty:
+        g1.plotly_chart(px.bar(aging, x='Faixa', y='valor', text='quantidade', title="Parcelas em aberto por atraso", labels={'Faixa': '', 'valor': 'R$'}), use_container_width=True)
+    if not caixa.empty:
+        g2.plotly_chart(px.bar(caixa.rename(columns={'entradas': 'Entradas', 'saidas': 'Saídas'}), x='Mês', y=['Entradas', 'Saídas'], barmode='group', title="Caixa dos últimos 12 meses", labels={'value': 'R$', 'variable': ''}), use_container_width=True)
+    st.divider()
+
 def tela_voltar():
     if st.button("⬅️ VOLTAR AO MENU", type="secondary"): st.session_state['page'] = 'menu'; st.rerun()
 
@@ -290,20 +635,21 @@ def tela_cadastro():
                 else:
                     try:
                         d_nasc = str(data_nasc) if data_nasc else None
-                        res_cli = supabase.table('clientes').insert({"nome": nome, "cpf": cpf, "email": email, "senha_meu_inss": senha_inss, "colaborador": colaborador, "data_nascimento": d_nasc}).execute()
-                        cli_id = res_cli.data[0]['id']
-                        
-                        res_proc = supabase.table('processos').insert({"cliente_id": cli_id, "tipo_beneficio": servico, "numero_requerimento": num_req, "status_processo": situacao, "esfera": esfera}).execute()
-                        proc_id = res_proc.data[0]['id']
-
+                        agendamentos = []
                         if data_pericia:
                             dt_full = datetime.combine(data_pericia, hora_pericia).isoformat()
                             status_p = "Compareceu" if check_pericia else "Pendente"
-                            supabase.table('agendamentos').insert({"processo_id": proc_id, "tipo_evento": tipo_pericia, "data_hora": dt_full, "local_cidade": local_pericia, "status_comparecimento": status_p}).execute()
+                            agendamentos.append({"tipo_evento": tipo_pericia, "data_hora": dt_full, "local_cidade": local_pericia, "status_comparecimento": status_p})
                         if data_social:
                             dt_full_s = datetime.combine(data_social, hora_social).isoformat()
                             status_s = "Compareceu" if check_social else "Pendente"
-                            supabase.table('agendamentos').insert({"processo_id": proc_id, "tipo_evento": tipo_social, "data_hora": dt_full_s, "local_cidade": local_social, "status_comparecimento": status_s}).execute()
+                            agendamentos.append({"tipo_evento": tipo_social, "data_hora": dt_full_s, "local_cidade": local_social, "status_comparecimento": status_s})
+                        # Cliente + processo + agendamentos numa só transação no banco
+                        res = repo.cadastrar_cliente_completo(
+                            {"nome": nome, "cpf": cpf, "email": email, "senha_meu_inss": senha_inss, "colaborador": colaborador, "data_nascimento": d_nasc},
+                            {"tipo_beneficio": servico, "numero_requerimento": num_req, "status_processo": situacao, "esfera": esfera},
+                            agendamentos)
+                        invalidar_cache('clientes', 'busca', f"processos:{res['cliente_id']}", 'agendamentos')
                         st.success(f"Cadastro realizado! Cliente: {nome}")
                     except Exception as e: st.error(f"Erro ao salvar: {e}")
 
@@ -311,90 +657,103 @@ def tela_busca_edicao():
     aplicar_estilo_visual(); mostrar_cabecalho(); tela_voltar()
     st.markdown("<h2 style='text-align: center;'>Buscar e Editar</h2>", unsafe_allow_html=True)
     
-    termo = st.text_input("Pesquisar Cliente (Nome ou CPF)", placeholder="Digite aqui...")
+    termo = st.text_input("Pesquisar Cliente (Nome, CPF ou NB)", placeholder="Digite aqui...").strip()
     
-    if termo:
-        res = supabase.table('clientes').select("*").ilike('nome', f"%{termo}%").order('nome').execute()
+    # Termos muito curtos casam com quase todo mundo: espera mais letras antes de ir ao banco
+    if termo and len(termo) < MIN_CARACTERES_BUSCA:
+        st.caption(f"Digite ao menos {MIN_CARACTERES_BUSCA} caracteres.")
+    elif termo:
+        # Paginação: "Mostrar mais" amplia o limite; trocar o termo volta para a primeira página
+        if st.session_state.get('busca_termo') != termo:
+            st.session_state['busca_termo'] = termo; st.session_state['busca_limite'] = TAMANHO_PAGINA_BUSCA
+        clientes, tem_mais = buscar_clientes_com_processos(termo, st.session_state['busca_limite'])
+        if not clientes: st.info("Nenhum cliente encontrado.")
         
-        for cli in res.data:
-            # --- LÓGICA DAS CORES (TAGS) ---
-            procs_cli = supabase.table('processos').select("status_processo").eq('cliente_id', cli['id']).execute().data
-            tags_visuais = ""
-            status_geral = cli.get('status_geral', 'Ativo')
-            
-            if status_geral == 'Arquivado':
-                tags_visuais += " :grey[🗄️ ARQUIVADO]"
-            
-            if procs_cli:
-                for p in procs_cli:
-                    stt = p['status_processo']
-                    if stt == "Documentos":
-                        tags_visuais += " :red[⛔ FALTA DOCS]"
-                    elif stt == "Em Análise":
-                        tags_visuais += " ⚪ EM ANÁLISE"
-                    elif stt == "Concedido":
-                        tags_visuais += " :green[✅ CONCEDIDO]"
-                    elif stt == "Indeferido":
-                        tags_visuais += " :red[❌ INDEFERIDO]"
-                    elif stt == "Em Exigência":
-                        tags_visuais += " :orange[⚠️ EXIGÊNCIA]"
-            # -------------------------------
-
-            with st.expander(f"👤 {cli['nome']} {tags_visuais}"):
+        for cli in clientes:
+            # A lista acabou de vir do banco: descarta versões guardadas pelos cartões
+            st.session_state.pop(f"cli_atual_{cli['id']}", None)
+            cartao_cliente(cli)
+
+        if tem_mais and st.button("⬇️ Mostrar mais resultados"):
+            st.session_state['busca_limite'] += TAMANHO_PAGINA_BUSCA; st.rerun()
+
+# Cada cliente é um fragmento: salvar status, arquivar ou editar dados recarrega só
+# o próprio cartão (e só o próprio cliente no banco), não a busca inteira.
+@fragmento
+def cartao_cliente(cli):
+    # Depois de uma gravação no próprio cartão, usa a versão recém-buscada do cliente
+    cli = st.session_state.get(f"cli_atual_{cli['id']}", cli)
+    status_geral = cli.get('status_geral', 'Ativo')
+    procs = cli.get('processos') or []
+    tags_visuais = montar_tags_status(status_geral, procs)
+
+    with st.expander(f"👤 {cli['nome']} {tags_visuais}", expanded=st.session_state.get(f"cli_aberto_{cli['id']}", False)):
+        
+        if status_geral == 'Ativo':
+            c_arq1, c_arq2 = st.columns([3, 1])
+            c_arq2.write("") 
+            with c_arq2.popover("🗑️ Arquivar"):
+                motivo = st.text_input("Motivo", key=f"mot_{cli['id']}")
+                if st.button("Confirmar", key=f"arq_{cli['id']}"):
+                    repo.atualizar_cliente(cli['id'], {'status_geral': 'Arquivado', 'motivo_arquivamento': motivo})
+                    st.success("Arquivado!"); atualizar_cartao_cliente(cli['id'])
+        else:
+            st.warning(f"Motivo: {cli.get('motivo_arquivamento', '-')}")
+            if st.button("Reativar", key=f"react_{cli['id']}"):
+                 repo.atualizar_cliente(cli['id'], {'status_geral': 'Ativo', 'motivo_arquivamento': None}); atualizar_cartao_cliente(cli['id'])
+
+        # A senha do Meu INSS não vem na busca: é lida só quando o formulário é aberto
+        chave_senha = f"senha_inss_{cli['id']}"
+        if st.toggle("✏️ Editar dados pessoais", key=f"editar_cli_{cli['id']}"):
+            if chave_senha not in st.session_state: st.session_state[chave_senha] = repo.senha_inss_cliente(cli['id'])
+            with st.form(key=f"edit_cli_{cli['id']}"):
+                st.markdown("**Dados Pessoais**")
+                c1, c2 = st.columns(2)
+                n_nome = c1.text_input("Nome", value=cli['nome'])
+                n_cpf = c2.text_input("CPF", value=cli['cpf'])
+                n_email = c1.text_input("Email", value=cli['email'])
+                n_senha = c2.text_input("Senha INSS", value=st.session_state[chave_senha])
+                if st.form_submit_button("ATUALIZAR DADOS", type="primary"):
+                    repo.atualizar_cliente(cli['id'], {"nome": n_nome, "cpf": n_cpf, "email": n_email, "senha_meu_inss": n_senha}); invalidar_cache('clientes')
+                    st.session_state.pop(chave_senha, None); st.success("Atualizado!"); atualizar_cartao_cliente(cli['id'])
+        else:
+            st.session_state.pop(chave_senha, None)
+            st.caption(f"CPF: {cli['cpf'] or '-'} | Email: {cli['email'] or '-'}")
+        
+        st.divider(); st.markdown("**Processos**")
+        
+        for p in procs:
+            with st.container(border=True):
+                c_p1, c_p2, c_p3, c_p4 = st.columns([2, 1.5, 1.5, 1])
+                c_p1.write(f"📂 **{p['tipo_beneficio']}**")
                 
-                if status_geral == 'Ativo':
-                    c_arq1, c_arq2 = st.columns([3, 1])
-                    c_arq2.write("") 
-                    with c_arq2.popover("🗑️ Arquivar"):
-                        motivo = st.text_input("Motivo", key=f"mot_{cli['id']}")
-                        if st.button("Confirmar", key=f"arq_{cli['id']}"):
-                            supabase.table('clientes').update({'status_geral': 'Arquivado', 'motivo_arquivamento': motivo}).eq('id', cli['id']).execute()
-                            st.success("Arquivado!"); st.rerun()
-                else:
-                    st.warning(f"Motivo: {cli.get('motivo_arquivamento', '-')}")
-                    if st.button("Reativar", key=f"react_{cli['id']}"):
-                         supabase.table('clientes').update({'status_geral': 'Ativo', 'motivo_arquivamento': None}).eq('id', cli['id']).execute(); st.rerun()
-
-                with st.form(key=f"edit_cli_{cli['id']}"):
-                    st.markdown("**Dados Pessoais**")
-                    c1, c2 = st.columns(2)
-                    n_nome = c1.text_input("Nome", value=cli['nome'])
-                    n_cpf = c2.text_input("CPF", value=cli['cpf'])
-                    n_email = c1.text_input("Email", value=cli['email'])
-                    n_senha = c2.text_input("Senha INSS", value=cli['senha_meu_inss'])
-                    if st.form_submit_button("ATUALIZAR DADOS", type="primary"):
-                        supabase.table('clientes').update({"nome": n_nome, "cpf": n_cpf, "email": n_email, "senha_meu_inss": n_senha}).eq('id', cli['id']).execute()
-                        st.success("Atualizado!"); st.rerun()
+                esfera_atual = p.get('esfera', 'Administrativo')
+                if not esfera_atual: esfera_atual = 'Administrativo'
+                nova_esfera = c_p2.selectbox("Esfera", ["Administrativo", "Judicial"], key=f"esf_{p['id']}", index=["Administrativo", "Judicial"].index(esfera_atual))
                 
-                st.divider(); st.markdown("**Processos**")
-                procs = supabase.table('processos').select("*").eq('cliente_id', cli['id']).execute().data
+                # Lista atualizada com "Documentos"
+                lista_status = ["Documentos", "Em Análise", "Em Exigência", "Concedido", "Indeferido", "Aguardando Perícia", "Judicial"]
+                idx_status = lista_status.index(p['status_processo']) if p['status_processo'] in lista_status else 1
+                novo_status = c_p3.selectbox("Status", lista_status, key=f"st_{p['id']}", index=idx_status)
                 
-                for p in procs:
-                    with st.container(border=True):
-                        c_p1, c_p2, c_p3, c_p4 = st.columns([2, 1.5, 1.5, 1])
-                        c_p1.write(f"📂 **{p['tipo_beneficio']}**")
-                        
-                        esfera_atual = p.get('esfera', 'Administrativo')
-                        if not esfera_atual: esfera_atual = 'Administrativo'
-                        nova_esfera = c_p2.selectbox("Esfera", ["Administrativo", "Judicial"], key=f"esf_{p['id']}", index=["Administrativo", "Judicial"].index(esfera_atual))
-                        
-                        # Lista atualizada com "Documentos"
-                        lista_status = ["Documentos", "Em Análise", "Em Exigência", "Concedido", "Indeferido", "Aguardando Perícia", "Judicial"]
-                        idx_status = lista_status.index(p['status_processo']) if p['status_processo'] in lista_status else 1
-                        novo_status = c_p3.selectbox("Status", lista_status, key=f"st_{p['id']}", index=idx_status)
-                        
-                        if c_p4.button("💾", key=f"bt_{p['id']}"):
-                            supabase.table('processos').update({"status_processo": novo_status, "esfera": nova_esfera}).eq('id', p['id']).execute()
-                            st.toast("Salvo!"); st.rerun()
-
-                with st.popover("➕ Adicionar Processo"):
-                    with st.form(key=f"form_add_p_{cli['id']}"):
-                        serv_novo = st.selectbox("Serviço", ["BPC/LOAS", "Auxílio Doença", "Aposentadoria"], key=f"new_serv_{cli['id']}")
-                        esfera_novo = st.selectbox("Esfera", ["Administrativo", "Judicial"], key=f"new_esf_{cli['id']}")
-                        nb_novo = st.text_input("Nº Requerimento", key=f"nb_{cli['id']}")
-                        if st.form_submit_button("Criar"):
-                            supabase.table('processos').insert({"cliente_id": cli['id'], "tipo_beneficio": serv_novo, "numero_requerimento": nb_novo, "status_processo": "Em Análise", "esfera": esfera_novo}).execute()
-                            st.rerun()
+                if c_p4.button("💾", key=f"bt_{p['id']}"):
+                    repo.atualizar_processo(p['id'], {"status_processo": novo_status, "esfera": nova_esfera}); invalidar_cache(f"processos:{cli['id']}")
+                    st.toast("Salvo!"); atualizar_cartao_cliente(cli['id'])
+
+        with st.popover("➕ Adicionar Processo"):
+            with st.form(key=f"form_add_p_{cli['id']}"):
+                serv_novo = st.selectbox("Serviço", ["BPC/LOAS", "Auxílio Doença", "Aposentadoria"], key=f"new_serv_{cli['id']}")
+                esfera_novo = st.selectbox("Esfera", ["Administrativo", "Judicial"], key=f"new_esf_{cli['id']}")
+                nb_novo = st.text_input("Nº Requerimento", key=f"nb_{cli['id']}")
+                if st.form_submit_button("Criar"):
+                    repo.inserir_processo({"cliente_id": cli['id'], "tipo_beneficio": serv_novo, "numero_requerimento": nb_novo, "status_processo": "Em Análise", "esfera": esfera_novo}); invalidar_cache(f"processos:{cli['id']}")
+                    atualizar_cartao_cliente(cli['id'])
+
+def atualizar_cartao_cliente(cliente_id):
+    invalidar_cache('busca')
+    st.session_state[f"cli_atual_{cliente_id}"] = buscar_cliente_com_processos(cliente_id)
+    st.session_state[f"cli_aberto_{cliente_id}"] = True
+    recarregar_fragmento()
 
 def tela_agenda():
     aplicar_estilo_visual(); mostrar_cabecalho(); tela_voltar()
@@ -403,113 +762,177 @@ def tela_agenda():
         c1, c2, c3 = st.columns([1, 1, 1])
         mes = c1.selectbox("Mês", range(1,13), index=datetime.now().month-1)
         ano = c2.number_input("Ano", value=datetime.now().year)
-    res = supabase.table('agendamentos').select("*, processos(id, clientes(nome))").order('data_hora').execute()
-    dados = []
-    if res.data:
-        for a in res.data:
-            dt = pd.to_datetime(a['data_hora'])
-            if dt.month == mes and dt.year == ano:
-                a['Data'] = formatar_data_hora(a['data_hora']); a['Cliente'] = a['processos']['clientes']['nome']
-                a['Status'] = a.get('status_comparecimento', 'Pendente'); dados.append(a)
+    dados = buscar_agendamentos_mes(mes, int(ano))
     if dados:
-        df = pd.DataFrame(dados)
+        df = montar_df_agenda(dados)
         st.dataframe(df[['Data', 'Cliente', 'tipo_evento', 'Status', 'local_cidade']], use_container_width=True)
         with c3:
             st.write(""); st.write("")
             if st.button("📄 PDF Mensal"):
-                pdf_bytes = gerar_pdf_agenda(dados, mes, ano)
+                pdf_bytes = pdf_agenda(mes, int(ano))
                 st.download_button("Baixar PDF Agenda", pdf_bytes, f"agenda_{mes}_{ano}.pdf", "application/pdf")
     else: st.info("Nada agendado para este período.")
 
+SECOES_FINANCEIRO = ["Fluxo de Caixa", "Gestão & Recibos", "Novo Contrato", "Relatórios"]
+
 def tela_financeiro():
     aplicar_estilo_visual(); mostrar_cabecalho(); tela_voltar()
     st.markdown("<h2 style='text-align: center;'>Financeiro</h2>", unsafe_allow_html=True)
-    abas = st.tabs(["Fluxo de Caixa", "Gestão & Recibos", "Novo Contrato"])
-    
-    with abas[0]:
-        st.subheader("Movimento do Dia")
-        data_f = st.date_input("Filtrar Data", value=date.today(), format="DD/MM/YYYY")
-        with st.expander("➕ Lançamento Avulso (Entrada/Saída)"):
-            c1, c2 = st.columns(2)
-            l_tipo = c1.selectbox("Tipo", ["Entrada", "Saída"])
-            l_val = c2.number_input("Valor R$", step=10.0)
-            l_desc = st.text_input("Descrição")
-            if st.button("Lançar Movimentação", type="primary"):
-                supabase.table('caixa').insert({"tipo": l_tipo, "valor": l_val, "descricao": l_desc, "usuario_responsavel": st.session_state['usuario']['usuario'], "data_movimentacao": datetime.now().isoformat()}).execute(); st.rerun()
-        
-        res = supabase.table('caixa').select("*").order('data_movimentacao', desc=True).execute()
-        filtrados = [x for x in res.data if pd.to_datetime(x['data_movimentacao']).date() == data_f]
-        if filtrados:
-            df = pd.DataFrame(filtrados)
-            df['Data'] = pd.to_datetime(df['data_movimentacao']).dt.strftime('%d/%m/%Y')
-            tot_ent = sum(x['valor'] for x in filtrados if x['tipo']=='Entrada'); tot_sai = sum(x['valor'] for x in filtrados if x['tipo']=='Saída')
-            m1, m2, m3 = st.columns(3); m1.metric("Entradas", f"R$ {tot_ent:.2f}"); m2.metric("Saídas", f"R$ {tot_sai:.2f}"); m3.metric("Saldo", f"R$ {tot_ent-tot_sai:.2f}")
-            st.dataframe(df[['Data', 'tipo', 'descricao', 'valor', 'usuario_responsavel']], use_container_width=True)
-            if st.button("📄 Baixar PDF do Dia"):
-                pdf = gerar_pdf_caixa(filtrados, data_f); st.download_button("Download PDF", pdf, f"caixa_{data_f}.pdf", "application/pdf")
-        else: st.info("Sem movimentos nesta data.")
-        
-    with abas[1]:
-        tipo_gestao = st.radio("Selecione o tipo de cobrança:", ["Parcelas Fixas (Promissórias)", "Recibos 30% (Auxílio/Recorrente)"], horizontal=True)
-        if tipo_gestao == "Parcelas Fixas (Promissórias)":
-            st.subheader("Parcelas Pendentes")
-            pendentes = supabase.table('parcelas').select("*, contratos(id, processos(id, clientes(nome)))").is_("data_pagamento", "null").order('data_vencimento').execute()
-            if pendentes.data:
-                for p in pendentes.data:
-                    try: cli_nome = p['contratos']['processos']['clientes']['nome']
-                    except: cli_nome = "Desconhecido"
-                    venc = formatar_data(p['data_vencimento']); cor = "red" if (date.today() - pd.to_datetime(p['data_vencimento']).date()).days > 0 else "blue"
-                    with st.expander(f":{cor}[{venc}] | {cli_nome} | R$ {p['valor_parcela']:.2f}"):
-                        c1, c2 = st.columns([2,1]); c1.write(f"Parcela {p['numero_parcela']}"); forma = c1.selectbox("Forma", ["Dinheiro", "Pix"], key=f"f_{p['id']}")
-                        if c2.button("✅ Baixar", key=f"rec_{p['id']}"):
-                            supabase.table('parcelas').update({"data_pagamento": date.today().isoformat(), "valor_pago": p['valor_parcela'], "forma_pagamento": forma}).eq('id', p['id']).execute()
-                            desc = f"Receb. Parc {p['numero_parcela']} - {cli_nome}"; supabase.table('caixa').insert({"tipo": "Entrada", "descricao": desc, "valor": p['valor_parcela'], "usuario_responsavel": st.session_state['usuario']['usuario'], "data_movimentacao": datetime.now().isoformat()}).execute(); st.success("Baixado!"); st.rerun()
-            else: st.info("Nenhuma parcela fixa pendente.")
-        else:
-            st.subheader("Cálculo e Baixa de Honorários (30%)")
-            cli_res = supabase.table('clientes').select("id, nome").order('nome').execute()
-            clientes_dict = {c['id']: c['nome'] for c in cli_res.data}
-            cli_sel = st.selectbox("Selecione o Cliente (Auxílio Doença)", options=list(clientes_dict.keys()), format_func=lambda x: clientes_dict[x])
-            if cli_sel:
-                st.write(f"Cliente: **{clientes_dict[cli_sel]}**"); col_v1, col_v2 = st.columns(2)
-                valor_recebido = col_v1.number_input("Valor Recebido pelo Cliente (R$)", min_value=0.0, step=100.0)
-                if valor_recebido > 0:
-                    valor_honorario = valor_recebido * 0.30; col_v2.metric("Honorários (30%)", f"R$ {valor_honorario:.2f}")
-                    forma_rec = st.selectbox("Forma de Pagamento", ["Dinheiro", "Pix", "Transferência"])
-                    if st.button("💰 Lançar e Baixar no Caixa", type="primary"):
-                        desc = f"Honorários 30% - {clientes_dict[cli_sel]} ({datetime.now().strftime('%m/%Y')})"; supabase.table('caixa').insert({"tipo": "Entrada", "descricao": desc, "valor": valor_honorario, "usuario_responsavel": st.session_state['usuario']['usuario'], "forma_pagamento": forma_rec, "data_movimentacao": datetime.now().isoformat()}).execute(); st.success(f"Recebimento de R$ {valor_honorario:.2f} lançado!"); st.rerun()
+    # Só a seção escolhida consulta o banco e desenha widgets (st.tabs executaria as três).
+    # Cada seção é um fragmento: mexer num widget dela reexecuta apenas a própria seção.
+    secao = st.radio("Seção", SECOES_FINANCEIRO, horizontal=True, key="fin_secao", label_visibility="collapsed")
+    if secao == SECOES_FINANCEIRO[0]: secao_fluxo_caixa()
+    elif secao == SECOES_FINANCEIRO[1]: secao_gestao_recibos()
+    elif secao == SECOES_FINANCEIRO[2]: secao_novo_contrato()
+    else: secao_relatorios()
+
+@fragmento
+def secao_fluxo_caixa():
+    st.subheader("Movimento do Dia")
+    data_f = st.date_input("Filtrar Data", value=date.today(), format="DD/MM/YYYY", key="fin_data")
+    with st.expander("➕ Lançamento Avulso (Entrada/Saída)"):
+        c1, c2 = st.columns(2)
+        l_tipo = c1.selectbox("Tipo", ["Entrada", "Saída"])
+        l_val = c2.number_input("Valor R$", step=10.0)
+        l_desc = st.text_input("Descrição")
+        if st.button("Lançar Movimentação", type="primary"):
+            repo.lancar_caixa({"tipo": l_tipo, "valor": l_val, "descricao": l_desc, "usuario_responsavel": st.session_state['usuario']['usuario'], "data_movimentacao": datetime.now().isoformat()}); invalidar_cache('caixa'); recarregar_fragmento()
     
-    with abas[2]:
-        st.subheader("Novo Contrato")
-        cli_res = supabase.table('clientes').select("id, nome").order('nome').execute(); clientes_dict = {c['id']: c['nome'] for c in cli_res.data}
-        cli_selecionado = st.selectbox("Selecione o Cliente", options=list(clientes_dict.keys()), format_func=lambda x: clientes_dict[x])
-        if cli_selecionado:
-            proc_res = supabase.table('processos').select("id, tipo_beneficio, numero_requerimento").eq('cliente_id', cli_selecionado).execute()
-            if proc_res.data:
-                proc_dict = {p['id']: f"{p['tipo_beneficio']} (NB: {p.get('numero_requerimento', '-')})" for p in proc_res.data}
-                proc_id = st.selectbox("Vincular ao Processo:", options=list(proc_dict.keys()), format_func=lambda x: proc_dict[x])
-                st.divider(); tipo_contrato = st.radio("Tipo de Cobrança", ["Valor Fixo (Promissórias)", "Recorrente (30% do Benefício/Recibo)"])
-                if tipo_contrato == "Valor Fixo (Promissórias)":
-                    c_val1, c_val2 = st.columns(2); valor_total = c_val1.number_input("Valor Total (R$)", min_value=0.0, step=100.0); valor_entrada = c_val2.number_input("Entrada (R$)", min_value=0.0, step=50.0)
-                    c_parc1, c_parc2 = st.columns(2); qtd_parcelas = c_parc1.number_input("Qtd Parcelas", min_value=1, value=1); vencimento_inicial = c_parc2.date_input("Vencimento 1ª Parcela", format="DD/MM/YYYY")
-                    saldo = valor_total - valor_entrada; 
-                    if saldo > 0: st.info(f"Serão geradas {qtd_parcelas} parcelas de R$ {saldo/qtd_parcelas:.2f}")
-                    if st.button("Gerar Contrato Fixo", type="primary"):
-                        if valor_total <= 0: st.error("Valor inválido.")
-                        else:
-                            res_cont = supabase.table('contratos').insert({"processo_id": proc_id, "valor_total": valor_total, "valor_entrada": valor_entrada, "qtd_parcelas": qtd_parcelas, "tipo_cobranca": "Fixa"}).execute(); contrato_id = res_cont.data[0]['id']
-                            if valor_entrada > 0: supabase.table('caixa').insert({"tipo": "Entrada", "descricao": f"Entrada Honorários - {clientes_dict[cli_selecionado]}", "valor": valor_entrada, "forma_pagamento": "Dinheiro", "usuario_responsavel": st.session_state['usuario']['usuario']}).execute()
-                            if saldo > 0:
-                                val_p = round(saldo / qtd_parcelas, 2); diff = round(saldo - (val_p * qtd_parcelas), 2)
-                                for i in range(qtd_parcelas):
-                                    valor_desta = val_p + diff if i == qtd_parcelas - 1 else val_p; data_venc = vencimento_inicial + relativedelta(months=i)
-                                    supabase.table('parcelas').insert({"contrato_id": contrato_id, "numero_parcela": i+1, "valor_parcela": valor_desta, "data_vencimento": str(data_venc), "forma_pagamento": "Pendente"}).execute()
-                            st.success("Contrato de Promissórias Gerado!"); st.rerun()
-                else:
-                    st.info("ℹ️ Este contrato não gera parcelas fixas.")
-                    if st.button("Salvar Contrato de 30%", type="primary"):
-                        supabase.table('contratos').insert({"processo_id": proc_id, "valor_total": 0, "valor_entrada": 0, "qtd_parcelas": 0, "tipo_cobranca": "Recorrente"}).execute(); st.success("Contrato de 30% Salvo!"); st.rerun()
-            else: st.warning("Este cliente não tem processos cadastrados.")
+    filtrados = buscar_caixa_periodo(data_f, data_f)
+    if filtrados:
+        df = pd.DataFrame(filtrados)
+        df['Data'] = pd.to_datetime(df['data_movimentacao'], format='ISO8601').dt.strftime('%d/%m/%Y')
+        tot_ent, tot_sai, saldo_dia = totais_caixa(df)
+        m1, m2, m3 = st.columns(3); m1.metric("Entradas", f"R$ {tot_ent:.2f}"); m2.metric("Saídas", f"R$ {tot_sai:.2f}"); m3.metric("Saldo", f"R$ {saldo_dia:.2f}")
+        st.dataframe(df[['Data', 'tipo', 'descricao', 'valor', 'usuario_responsavel']], use_container_width=True)
+        if st.button("📄 Baixar PDF do Dia"):
+            pdf = pdf_caixa(data_f, data_f); st.download_button("Download PDF", pdf, f"caixa_{data_f}.pdf", "application/pdf")
+    else: st.info("Sem movimentos nesta data.")
+
+@fragmento
+def secao_gestao_recibos():
+    tipo_gestao = st.radio("Selecione o tipo de cobrança:", OPCOES_GESTAO, horizontal=True, key="fin_tipo_gestao")
+    if tipo_gestao == OPCOES_GESTAO[0]:
+        st.subheader("Parcelas Pendentes")
+        # O resumo e a página não dependem um do outro: saem juntos. A faixa vem do
+        # session_state, onde o rádio "Mostrar" (desenhado abaixo) guardou a escolha.
+        faixa_sel = st.session_state.get('parc_faixa', FAIXAS_VENCIMENTO[0])
+        # Pilha de cursores (data_vencimento, id): o topo é o início da página atual
+        if st.session_state.get('parc_faixa_atual') != faixa_sel:
+            st.session_state['parc_faixa_atual'] = faixa_sel; st.session_state['parc_cursores'] = [None]
+        cursores = st.session_state['parc_cursores']
+        dados = buscar_em_paralelo(resumo=resumo_parcelas_pendentes, pendentes=lambda: buscar_parcelas_pendentes(faixa_sel, cursores[-1]))
+        for col, faixa in zip(st.columns(len(FAIXAS_VENCIMENTO)), FAIXAS_VENCIMENTO):
+            qtd, valor = dados['resumo'].get(faixa, (0, 0)); col.metric(f"{faixa} ({qtd})", f"R$ {valor:.2f}")
+        st.radio("Mostrar", FAIXAS_VENCIMENTO, horizontal=True, key="parc_faixa")
+        pagina, tem_mais = dados['pendentes']
+        st.session_state['parc_baixadas'] = set()
+        if 'parc_msg_lote' in st.session_state: st.success(st.session_state.pop('parc_msg_lote'))
+        if pagina:
+            with st.container(border=True):
+                rotulos = {p['id']: f"{formatar_data(p['data_vencimento'])} | {nome_cliente_parcela(p)} | Parc. {p['numero_parcela']} | R$ {p['valor_parcela']:.2f}" for p in pagina}
+                c_sel, c_forma = st.columns([3, 1])
+                sel = c_sel.multiselect("Baixar várias parcelas de uma vez", list(rotulos), format_func=rotulos.get, key="parc_lote")
+                forma_lote = c_forma.selectbox("Forma", ["Dinheiro", "Pix"], key="parc_lote_forma")
+                if sel and st.button(f"✅ Baixar {len(sel)} parcela(s) - R$ {sum(p['valor_parcela'] for p in pagina if p['id'] in sel):.2f}", type="primary", key="parc_lote_baixar"):
+                    qtd = baixar_parcelas(sel, forma_lote); st.session_state.pop('parc_lote', None)
+                    st.session_state['parc_msg_lote'] = f"✅ {qtd} parcela(s) baixada(s) e lançada(s) no caixa."; recarregar_fragmento()
+            for p in pagina: cartao_parcela(p)
+            c_ant, c_pag, c_prox = st.columns([1, 2, 1])
+            if len(cursores) > 1 and c_ant.button("⬅️ Anterior", key="parc_ant"): cursores.pop(); recarregar_fragmento()
+            c_pag.markdown(f"<p style='text-align: center;'>Página {len(cursores)}</p>", unsafe_allow_html=True)
+            if tem_mais and c_prox.button("Próxima ➡️", key="parc_prox"): cursores.append((pagina[-1]['data_vencimento'], pagina[-1]['id'])); recarregar_fragmento()
+        else: st.info(f"Nenhuma parcela em '{faixa_sel}'.")
+    else:
+        st.subheader("Cálculo e Baixa de Honorários (30%)")
+        clientes_dict = {c['id']: c['nome'] for c in listar_clientes()}
+        cli_sel = st.selectbox("Selecione o Cliente (Auxílio Doença)", options=list(clientes_dict.keys()), format_func=lambda x: clientes_dict[x])
+        if cli_sel:
+            st.write(f"Cliente: **{clientes_dict[cli_sel]}**"); col_v1, col_v2 = st.columns(2)
+            valor_recebido = col_v1.number_input("Valor Recebido pelo Cliente (R$)", min_value=0.0, step=100.0)
+            if valor_recebido > 0:
+                valor_honorario = valor_recebido * 0.30; col_v2.metric("Honorários (30%)", f"R$ {valor_honorario:.2f}")
+                forma_rec = st.selectbox("Forma de Pagamento", ["Dinheiro", "Pix", "Transferência"])
+                if st.button("💰 Lançar e Baixar no Caixa", type="primary"):
+                    desc = f"Honorários 30% - {clientes_dict[cli_sel]} ({datetime.now().strftime('%m/%Y')})"; repo.lancar_caixa({"tipo": "Entrada", "descricao": desc, "valor": valor_honorario, "usuario_responsavel": st.session_state['usuario']['usuario'], "forma_pagamento": forma_rec, "data_movimentacao": datetime.now().isoformat()}); invalidar_cache('caixa'); st.success(f"Recebimento de R$ {valor_honorario:.2f} lançado!"); recarregar_fragmento()
+
+def nome_cliente_parcela(p):
+    try: return p['contratos']['processos']['clientes']['nome']
+    except: return "Desconhecido"
+
+# Cada parcela é um fragmento: "Baixar" grava e redesenha só o próprio cartão
+@fragmento
+def cartao_parcela(p):
+    cli_nome = nome_cliente_parcela(p)
+    if p['id'] in st.session_state.get('parc_baixadas', set()):
+        st.success(f"✅ Parcela {p['numero_parcela']} de {cli_nome} baixada."); return
+    venc = formatar_data(p['data_vencimento']); cor = "red" if (date.today() - pd.to_datetime(p['data_vencimento']).date()).days > 0 else "blue"
+    with st.expander(f":{cor}[{venc}] | {cli_nome} | R$ {p['valor_parcela']:.2f}"):
+        c1, c2 = st.columns([2,1]); c1.write(f"Parcela {p['numero_parcela']}"); forma = c1.selectbox("Forma", ["Dinheiro", "Pix"], key=f"f_{p['id']}")
+        if c2.button("✅ Baixar", key=f"rec_{p['id']}"):
+            baixar_parcelas([p['id']], forma); st.session_state.setdefault('parc_baixadas', set()).add(p['id']); recarregar_fragmento()
+
+@fragmento
+def secao_novo_contrato():
+    st.subheader("Novo Contrato")
+    clientes_dict = {c['id']: c['nome'] for c in listar_clientes()}
+    cli_selecionado = st.selectbox("Selecione o Cliente", options=list(clientes_dict.keys()), format_func=lambda x: clientes_dict[x])
+    if cli_selecionado:
+        processos_cli = listar_processos_cliente(cli_selecionado)
+        if processos_cli:
+            proc_dict = {p['id']: f"{p['tipo_beneficio']} (NB: {p.get('numero_requerimento', '-')})" for p in processos_cli}
+            proc_id = st.selectbox("Vincular ao Processo:", options=list(proc_dict.keys()), format_func=lambda x: proc_dict[x])
+            st.divider(); tipo_contrato = st.radio("Tipo de Cobrança", ["Valor Fixo (Promissórias)", "Recorrente (30% do Benefício/Recibo)"])
+            if tipo_contrato == "Valor Fixo (Promissórias)":
+                c_val1, c_val2 = st.columns(2); valor_total = c_val1.number_input("Valor Total (R$)", min_value=0.0, step=100.0); valor_entrada = c_val2.number_input("Entrada (R$)", min_value=0.0, step=50.0)
+                c_parc1, c_parc2 = st.columns(2); qtd_parcelas = c_parc1.number_input("Qtd Parcelas", min_value=1, value=1); vencimento_inicial = c_parc2.date_input("Vencimento 1ª Parcela", format="DD/MM/YYYY")
+                saldo = valor_total - valor_entrada; 
+                if saldo > 0: st.info(f"Serão geradas {qtd_parcelas} parcelas de R$ {saldo/qtd_parcelas:.2f}")
+                if st.button("Gerar Contrato Fixo", type="primary"):
+                    if valor_total <= 0: st.error("Valor inválido.")
+                    else:
+                        parcelas = montar_parcelas(saldo, qtd_parcelas, vencimento_inicial) if saldo > 0 else []
+                        try:
+                            repo.gerar_contrato_fixo(proc_id, valor_total, valor_entrada, qtd_parcelas, f"Entrada Honorários - {clientes_dict[cli_selecionado]}", st.session_state['usuario']['usuario'], parcelas)
+                            invalidar_cache('caixa')
+                            st.success("Contrato de Promissórias Gerado!"); recarregar_fragmento()
+                        except Exception as e: st.error(f"Erro ao gerar contrato: {e}")
+            else:
+                st.info("ℹ️ Este contrato não gera parcelas fixas.")
+                if st.button("Salvar Contrato de 30%", type="primary"):
+                    repo.inserir_contrato({"processo_id": proc_id, "valor_total": 0, "valor_entrada": 0, "qtd_parcelas": 0, "tipo_cobranca": "Recorrente"}); st.success("Contrato de 30% Salvo!"); recarregar_fragmento()
+        else: st.warning("Este cliente não tem processos cadastrados.")
+
+@fragmento
+def secao_relatorios():
+    st.subheader("Relatório de Caixa")
+    hoje = date.today()
+    periodo = st.radio("Período", ["Mensal", "Intervalo de datas"], horizontal=True, key="rel_periodo")
+    c1, c2 = st.columns(2)
+    if periodo == "Mensal":
+        mes = c1.selectbox("Mês", range(1, 13), index=hoje.month - 1, key="rel_mes")
+        ano = int(c2.number_input("Ano", value=hoje.year, key="rel_ano"))
+        inicio = date(ano, mes, 1); fim = inicio + relativedelta(months=1, days=-1)
+    else:
+        inicio = c1.date_input("De", value=hoje.replace(day=1), format="DD/MM/YYYY", key="rel_inicio")
+        fim = c2.date_input("Até", value=hoje, format="DD/MM/YYYY", key="rel_fim")
+        if inicio > fim: st.warning("A data inicial deve ser anterior à final."); return
+
+    saldo_inicial, linhas = relatorio_caixa(inicio, fim)
+    df_dias, df_formas = montar_relatorio_caixa(saldo_inicial, linhas)
+    tot_ent = float(df_formas['Entradas'].sum()); tot_sai = float(df_formas['Saídas'].sum())
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Saldo Inicial", f"R$ {saldo_inicial:.2f}"); m2.metric("Entradas", f"R$ {tot_ent:.2f}")
+    m3.metric("Saídas", f"R$ {tot_sai:.2f}"); m4.metric("Saldo Final", f"R$ {saldo_inicial + tot_ent - tot_sai:.2f}")
+    if not linhas: st.info("Sem movimentos neste período."); return
+    st.dataframe(df_dias, use_container_width=True, hide_index=True)
+    st.caption("Totais por forma de pagamento")
+    st.dataframe(df_formas, use_container_width=True, hide_index=True)
+    nome = f"caixa_{inicio:%Y%m%d}_{fim:%Y%m%d}"
+    d1, d2 = st.columns(2)
+    d1.download_button("📊 Baixar CSV", csv_relatorio_caixa(saldo_inicial, df_dias), f"{nome}.csv", "text/csv")
+    if d2.button("📄 Gerar PDF do Período"):
+        d2.download_button("Download PDF", pdf_relatorio_caixa(inicio, fim), f"{nome}.pdf", "application/pdf")
 
 def tela_usuarios():
     aplicar_estilo_visual(); mostrar_cabecalho(); tela_voltar(); st.title("👥 Gestão de Usuários")
@@ -517,18 +940,88 @@ def tela_usuarios():
     with st.form("new_user"):
         st.subheader("Novo Funcionário"); u_nome = st.text_input("Nome"); u_login = st.text_input("Login/Usuário"); u_senha = st.text_input("Senha Inicial"); u_perfil = st.selectbox("Perfil", ["comum", "admin"])
         if st.form_submit_button("Criar Usuário", type="primary"):
-            try: supabase.table('usuarios').insert({"nome": u_nome, "usuario": u_login, "senha": u_senha, "perfil": u_perfil}).execute(); st.success(f"Usuário {u_login} criado!")
+            try: repo.criar_usuario({"nome": u_nome, "usuario": u_login, "senha": u_senha, "perfil": u_perfil}); st.success(f"Usuário {u_login} criado!")
             except: st.error("Erro. Talvez o login já exista.")
+    c1, c2 = st.columns(2)
+    if c1.button("🩺 Diagnóstico de Consultas"): st.session_state['page'] = 'diagnostico'; st.rerun()
+    if c2.button("📥 Importar / Exportar"): st.session_state['page'] = 'importacao'; st.rerun()
+
+def tela_diagnostico():
+    aplicar_estilo_visual(); mostrar_cabecalho(); tela_voltar(); st.title("🩺 Diagnóstico de Consultas")
+    if st.session_state['usuario'].get('perfil') != 'admin': st.error("Acesso negado."); return
+    supabase.registro.medir_tamanho = st.toggle("Medir tamanho das respostas (bytes)", value=supabase.registro.medir_tamanho, help="Serializa cada resposta de novo para medir; deixa as consultas um pouco mais lentas. Vale para todas as sessões.")
+    df = supabase.registro.como_dataframe()
+    if df.empty: st.info("Nenhuma consulta registrada ainda."); return
+    # Uma execução = um rerun da página ou de um fragmento
+    execucoes = df.groupby(['pagina', 'execucao']).agg(consultas=('ms', 'size'), ms=('ms', 'sum'), linhas=('linhas', 'sum'), bytes=('bytes', lambda s: s.sum(min_count=1))).reset_index()
+    por_pagina = execucoes.groupby('pagina').agg(**{
+        "Execuções": ('execucao', 'size'), "Consultas/execução (média)": ('consultas', 'mean'), "Consultas/execução (máx)": ('consultas', 'max'),
+        "Banco/execução (ms, média)": ('ms', 'mean'), "Banco/execução (ms, p95)": ('ms', lambda s: s.quantile(0.95)), "KB/execução (média)": ('bytes', lambda s: s.mean() / 1024),
+    }).round(1).reset_index().rename(columns={'pagina': 'Página'})
+    st.subheader("Consultas por página"); st.dataframe(por_pagina, use_container_width=True, hide_index=True)
+    st.subheader("Consultas mais lentas")
+    st.dataframe(df.nlargest(20, 'ms'), use_container_width=True, hide_index=True)
+    st.subheader("Execuções recentes")
+    st.dataframe(execucoes.sort_values('execucao', ascending=False).head(20), use_container_width=True, hide_index=True)
+    st.download_button("⬇️ Exportar consultas (JSON Lines)", df.to_json(orient='records', lines=True, force_ascii=False), "consultas.jsonl", "application/x-ndjson")
+    with st.expander("📊 Latência das consultas por tabela"):
+        st.dataframe(supabase.histograma.como_dataframe(), use_container_width=True, hide_index=True)
+
+IMPORTACOES = {"Clientes e processos": "clientes", "Caixa": "caixa"}
+EXPORTACOES = {"Clientes": "clientes", "Processos": "processos", "Caixa": "caixa"}
+CACHES_IMPORTACAO = {"clientes": ("clientes", "busca", "processos"), "caixa": ("caixa",)}
+
+def resumo_importacao(tipo, totais):
+    if tipo == "clientes": return f"{totais.get('lidas', 0)} linhas: {totais.get('inseridos', 0)} clientes novos, {totais.get('atualizados', 0)} atualizados, {totais.get('processos', 0)} processos gravados."
+    return f"{totais.get('lidas', 0)} linhas: {totais.get('inseridos', 0)} movimentos lançados."
+
+def tela_importacao():
+    aplicar_estilo_visual(); mostrar_cabecalho(); tela_voltar(); st.title("📥 Importar / Exportar")
+    if st.session_state['usuario'].get('perfil') != 'admin': st.error("Acesso negado."); return
+    st.subheader("Importar planilha")
+    tipo = IMPORTACOES[st.radio("Dados", list(IMPORTACOES), horizontal=True, key="imp_tipo")]
+    st.caption(f"Colunas: {', '.join(COLUNAS_IMPORTACAO[tipo])} (obrigatórias: {', '.join(OBRIGATORIAS[tipo])}). "
+               + ("Clientes são casados pelo CPF: os existentes são atualizados. Uma linha por processo, casado pelo processo_id (planilha exportada), pelo NB ou, sem NB, pelo tipo de benefício." if tipo == "clientes" else "Movimento já lançado no caixa (mesma data, tipo, valor e descrição) é ignorado e listado entre as rejeitadas; repetido na planilha, entra quantas vezes aparecer."))
+    arquivo = st.file_uploader("Arquivo CSV ou Excel (.xlsx)", type=["csv", "xlsx"], key="imp_arquivo")
+    codificacao = st.selectbox("Codificação do CSV", ["utf-8-sig", "latin-1"], format_func={"utf-8-sig": "UTF-8", "latin-1": "Windows (Latin-1)"}.get, key="imp_codificacao")
+    if arquivo and st.button("📥 Importar", type="primary"):
+        andamento = st.empty(); gravado = {}  # totais dos blocos já gravados, para o caso de falha no meio
+        def ao_avancar(t):
+            gravado.update(t); andamento.caption(f"{t['lidas']} linhas lidas, {t['rejeitadas']} rejeitadas...")
+        try:
+            totais, rejeitados = importar(repo, tipo, ler_planilha(arquivo, arquivo.name, codificacao), st.session_state['usuario']['usuario'], ao_avancar=ao_avancar)
+        except (ValueError, UnicodeDecodeError, *ERROS_BANCO) as e:
+            andamento.empty()
+            if not gravado: st.error(f"Nada foi importado: {e}"); return
+            # Cada bloco é gravado à parte: os anteriores ao erro já estão no banco
+            st.error(f"Importação parcial: as linhas a partir da {gravado['lidas'] + 2} não foram gravadas ({e}).")
+            st.warning(f"Já gravado: {resumo_importacao(tipo, gravado)} Importar o arquivo de novo é seguro: o que já entrou não é duplicado.")
+            return
+        finally: invalidar_cache(*CACHES_IMPORTACAO[tipo])
+        andamento.empty()
+        st.success(resumo_importacao(tipo, totais))
+        if len(rejeitados):
+            st.warning(f"{len(rejeitados)} linhas rejeitadas (corrija e importe de novo só estas):")
+            st.dataframe(rejeitados, use_container_width=True, hide_index=True)
+            st.download_button("⬇️ Linhas rejeitadas (CSV)", rejeitados.to_csv(index=False, sep=';').encode('utf-8-sig'), "rejeitadas.csv", "text/csv")
+    st.divider(); st.subheader("Exportar")
+    # O arquivo só é gerado no clique (data como função), paginando a tabela pelo id
+    formato = st.radio("Formato", ["csv", "xlsx"], horizontal=True, format_func={"csv": "CSV", "xlsx": "Excel"}.get, key="exp_formato")
+    mime = "text/csv" if formato == "csv" else "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    for col, (rotulo, tabela) in zip(st.columns(len(EXPORTACOES)), EXPORTACOES.items()):
+        col.download_button(f"⬇️ {rotulo}", lambda tabela=tabela: exportar(repo.exportar(tabela), formato), f"{tabela}_{date.today()}.{formato}", mime, key=f"exp_{tabela}", on_click="ignore")
 
 def tela_meus_dados():
     aplicar_estilo_visual(); mostrar_cabecalho(); tela_voltar(); st.title("🔒 Meus Dados")
-    meu_id = st.session_state['usuario']['id']; dados_atuais = supabase.table('usuarios').select("*").eq('id', meu_id).execute().data[0]
+    meu_id = st.session_state['usuario']['id']; dados_atuais = obter_usuario(meu_id)
     with st.form("form_meus_dados"):
-        st.write("Atualize seus dados abaixo:"); novo_nome = st.text_input("Meu Nome", value=dados_atuais['nome']); nova_senha = st.text_input("Nova Senha", type="password", value=dados_atuais['senha'])
+        st.write("Atualize seus dados abaixo:"); novo_nome = st.text_input("Meu Nome", value=dados_atuais['nome']); nova_senha = st.text_input("Nova Senha", type="password", placeholder="Deixe em branco para manter a atual")
         if st.form_submit_button("💾 Salvar Alterações", type="primary"):
-            supabase.table('usuarios').update({"nome": novo_nome, "senha": nova_senha}).eq('id', meu_id).execute(); st.session_state['usuario']['nome'] = novo_nome; st.success("Dados atualizados com sucesso!"); st.rerun()
+            repo.atualizar_usuario(meu_id, {"nome": novo_nome, **({"senha": nova_senha} if nova_senha else {})}); invalidar_cache(f"usuario:{meu_id}"); st.session_state['usuario']['nome'] = novo_nome; st.success("Dados atualizados com sucesso!"); st.rerun()
 
 def main():
+    # Cada rerun completo é uma execução na medição de consultas (fragmentos abrem a sua)
+    iniciar_execucao(st.session_state.get('page', 'menu') if 'usuario' in st.session_state else 'login')
     if 'usuario' not in st.session_state:
         aplicar_estilo_visual(); st.write(""); st.write(""); c1, c2, c3 = st.columns([1,2,1])
         with c2:
@@ -537,8 +1030,8 @@ def main():
             st.markdown("<h3 style='text-align: center; color: #FFFFFF;'>ACESSO</h3>", unsafe_allow_html=True)
             u = st.text_input("Usuário"); s = st.text_input("Senha", type="password")
             if st.button("ENTRAR", use_container_width=True, type="primary"):
-                res = supabase.table('usuarios').select("*").eq('usuario', u).eq('senha', s).execute()
-                if res.data: st.session_state['usuario'] = res.data[0]; st.session_state['page'] = 'menu'; st.rerun()
+                res = repo.autenticar(u, s)
+                if res: st.session_state['usuario'] = res[0]; st.session_state['page'] = 'menu'; st.rerun()
                 else: st.error("Login inválido")
     else:
         pg = st.session_state.get('page', 'menu')
@@ -548,6 +1041,8 @@ def main():
         elif pg == 'agenda': tela_agenda()
         elif pg == 'financeiro': tela_financeiro()
         elif pg == 'usuarios': tela_usuarios()
+        elif pg == 'diagnostico': tela_diagnostico()
+        elif pg == 'importacao': tela_importacao()
         elif pg == 'meus_dados': tela_meus_dados()
 
 if __name__ == "__main__":
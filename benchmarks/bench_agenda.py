@@ -0,0 +1,92 @@
+# Benchmark da consulta mensal da Agenda.
+#
+# Compara o caminho antigo (tabela inteira + filtro de mês/ano em Python, linha a linha)
+# com o novo (intervalo gte/lt em data_hora sobre índice + DataFrame vetorizado)
+# à medida que o histórico cresce. Cada mês tem sempre o mesmo volume de compromissos;
+# só a quantidade de meses anteriores aumenta.
+#
+# Usa SQLite em memória como substituto do Postgres, com o mesmo índice da migração
+# supabase/migrations/20261018120000_indice_agendamentos_data_hora.sql.
+#
+#   python benchmarks/bench_agenda.py --tamanhos 1000 5000 20000
+import argparse
+import random
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+POR_MES = 150
+
+
+def criar_banco(total, hoje):
+    con = sqlite3.connect(":memory:")
+    con.execute("create table agendamentos (id integer primary key, processo_id integer, tipo_evento text, data_hora text, local_cidade text, status_comparecimento text)")
+    con.execute("create index idx_agendamentos_data_hora on agendamentos (data_hora)")
+    meses = max(1, total // POR_MES)
+    inicio = date(hoje.year, hoje.month, 1) - relativedelta(months=meses - 1)
+    rnd = random.Random(42)
+    linhas = []
+    for i in range(total):
+        mes = inicio + relativedelta(months=i % meses)
+        dh = datetime(mes.year, mes.month, rnd.randint(1, 28), rnd.randint(8, 17), 0)
+        linhas.append((i + 1, rnd.randint(1, 5000), "Perícia Médica INSS", dh.isoformat(), "Agência INSS", rnd.choice(["Pendente", "Compareceu", None])))
+    con.executemany("insert into agendamentos values (?, ?, ?, ?, ?, ?)", linhas)
+    con.commit()
+    return con
+
+
+def consultar(con, sql, params=()):
+    cur = con.execute(sql, params)
+    nomes = [c[0] for c in cur.description]
+    return [dict(zip(nomes, linha)) for linha in cur.fetchall()]
+
+
+def caminho_antigo(con, mes, ano):
+    dados = []
+    for a in consultar(con, "select * from agendamentos order by data_hora"):
+        dt = pd.to_datetime(a['data_hora'])
+        if dt.month == mes and dt.year == ano:
+            a['Data'] = pd.to_datetime(a['data_hora']).strftime('%d/%m/%Y %H:%M')
+            a['Status'] = a.get('status_comparecimento', 'Pendente'); dados.append(a)
+    return pd.DataFrame(dados)
+
+
+def caminho_novo(con, mes, ano):
+    inicio = date(ano, mes, 1); fim = inicio + relativedelta(months=1)
+    dados = consultar(con, "select * from agendamentos where data_hora >= ? and data_hora < ? order by data_hora", (inicio.isoformat(), fim.isoformat()))
+    df = pd.DataFrame(dados)
+    df['Data'] = pd.to_datetime(df['data_hora'], format='ISO8601').dt.strftime('%d/%m/%Y %H:%M')
+    df['Status'] = df['status_comparecimento'].fillna('Pendente')
+    return df
+
+
+def medir(fn, repeticoes):
+    melhor = None
+    for _ in range(repeticoes):
+        t0 = time.perf_counter(); fn(); dt = time.perf_counter() - t0
+        melhor = dt if melhor is None else min(melhor, dt)
+    return melhor * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark da consulta mensal da Agenda")
+    ap.add_argument("--tamanhos", type=int, nargs="+", default=[1_000, 5_000, 20_000])
+    ap.add_argument("--repeticoes", type=int, default=3)
+    args = ap.parse_args()
+
+    hoje = date.today()
+    print(f"{'histórico':>10} | {'linhas no mês':>13} | {'antigo (ms)':>11} | {'novo (ms)':>9}")
+    for total in args.tamanhos:
+        con = criar_banco(total, hoje)
+        linhas_mes = len(caminho_novo(con, hoje.month, hoje.year))
+        antigo = medir(lambda: caminho_antigo(con, hoje.month, hoje.year), args.repeticoes)
+        novo = medir(lambda: caminho_novo(con, hoje.month, hoje.year), args.repeticoes)
+        print(f"{total:>10} | {linhas_mes:>13} | {antigo:>11.1f} | {novo:>9.1f}")
+        con.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# Benchmark das telas do app sobre o banco local (repositorio.BancoLocal, SQLite em memória).
+#
+# Popula o banco com um volume de escritório grande (por padrão 50 mil clientes, 200 mil
+# movimentos de caixa e 100 mil parcelas), executa cada tela com o AppTest do Streamlit
+# e mostra, por tela, quantas idas ao banco ela fez e o tempo total:
+#   - frio:   cache do Streamlit vazio
+#   - quente: a mesma tela executada de novo, com o cache preenchido
+#
+#   python benchmarks/bench_telas.py
+#   python benchmarks/bench_telas.py --clientes 5000 --caixa 20000 --parcelas 10000
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+from repositorio import banco_local  # noqa: E402
+
+NOMES = ["Maria", "José", "Ana", "João", "Antônio", "Francisca", "Luiz", "Adriana", "Paulo", "Márcia", "Carlos", "Aline", "Raimundo", "Sônia", "Pedro", "Juliana"]
+SOBRENOMES = ["Silva", "Santos", "Oliveira", "Souza", "Lima", "Pereira", "Ferreira", "Alves", "Conceição", "Araújo", "Gonçalves", "Ribeiro", "Magalhães", "Gomes"]
+STATUS = ["Documentos", "Em Análise", "Em Exigência", "Concedido", "Indeferido", "Aguardando Perícia"]
+SERVICOS = ["BPC/LOAS", "Auxílio Doença", "Aposentadoria", "Salário Maternidade", "Pensão"]
+EVENTOS = ["Perícia Médica INSS", "Perícia Judicial", "Audiência", "Avaliação Social INSS"]
+FORMAS = ["Dinheiro", "Pix", "Transferência"]
+BANCO = ":memory:"
+
+
+def popular(banco, clientes, caixa, parcelas, hoje):
+    rnd = random.Random(42)
+    banco.inserir_em_massa('usuarios', ['id', 'nome', 'usuario', 'senha', 'perfil'], [(1, 'Admin', 'admin', 'admin', 'admin')])
+    banco.inserir_em_massa('clientes', ['id', 'nome', 'cpf', 'email', 'status_geral'], [
+        (i, f"{rnd.choice(NOMES)} {rnd.choice(SOBRENOMES)} {rnd.choice(SOBRENOMES)}", f"{rnd.randrange(10**11):011d}", f"cliente{i}@email.com", 'Arquivado' if i % 10 == 0 else 'Ativo')
+        for i in range(1, clientes + 1)])
+    banco.inserir_em_massa('processos', ['id', 'cliente_id', 'tipo_beneficio', 'numero_requerimento', 'status_processo', 'esfera'], [
+        (i, i, rnd.choice(SERVICOS), f"{rnd.randrange(10**10):010d}", rnd.choice(STATUS), rnd.choice(["Administrativo", "Judicial"]))
+        for i in range(1, clientes + 1)])
+    banco.inserir_em_massa('agendamentos', ['processo_id', 'tipo_evento', 'data_hora', 'local_cidade', 'status_comparecimento'], [
+        (rnd.randint(1, clientes), rnd.choice(EVENTOS), datetime.combine(hoje + timedelta(days=rnd.randint(-365, 60)), datetime.min.time()).replace(hour=rnd.randint(8, 17)).isoformat(), "Agência INSS", None)
+        for _ in range(clientes * 2 // 5)])
+    banco.inserir_em_massa('caixa', ['tipo', 'valor', 'descricao', 'usuario_responsavel', 'forma_pagamento', 'data_movimentacao'], [
+        ("Entrada" if rnd.random() < 0.7 else "Saída", round(rnd.uniform(20, 2000), 2), "Movimento", "admin", rnd.choice(FORMAS), datetime.combine(hoje - timedelta(days=rnd.randint(0, 730)), datetime.min.time()).replace(hour=rnd.randint(8, 17)).isoformat())
+        for _ in range(caixa)])
+    contratos = max(1, parcelas // 4)
+    banco.inserir_em_massa('contratos', ['id', 'processo_id', 'valor_total', 'valor_entrada', 'qtd_parcelas', 'tipo_cobranca'], [
+        (i, rnd.randint(1, clientes), 4000, 0, 4, 'Fixa') for i in range(1, contratos + 1)])
+    linhas = []
+    for i in range(parcelas):
+        venc = hoje + timedelta(days=rnd.randint(-365, 365))
+        pago = venc < hoje and rnd.random() < 0.6
+        linhas.append((i // 4 + 1, i % 4 + 1, 1000, venc.isoformat(), venc.isoformat() if pago else None, 1000 if pago else None, 'Pix' if pago else 'Pendente'))
+    banco.inserir_em_massa('parcelas', ['contrato_id', 'numero_parcela', 'valor_parcela', 'data_vencimento', 'data_pagamento', 'valor_pago', 'forma_pagamento'], linhas)
+
+
+def abrir(pagina):
+    at = AppTest.from_file(os.path.join(RAIZ, "app.py"), default_timeout=300)
+    at.secrets["BANCO_LOCAL"] = BANCO
+    at.session_state["usuario"] = {"id": 1, "nome": "Admin", "usuario": "admin", "perfil": "admin"}
+    at.session_state["page"] = pagina
+    return at
+
+
+def busca(at):
+    at.run(); at.text_input[0].input("silva").run()
+
+def secao(nome):
+    def executar(at):
+        at.run(); at.radio(key="fin_secao").set_value(nome).run()
+    return executar
+
+def cadastro(at):
+    at.run()
+    at.text_input[0].input("Cliente Benchmark"); at.text_input[1].input("123.456.789-00")
+    at.button[-1].click().run()
+
+# (tela, página, interação). A interação roda a tela do jeito que a equipe usa.
+TELAS = [
+    ("menu", "menu", lambda at: at.run()),
+    ("busca", "busca", busca),
+    ("agenda", "agenda", lambda at: at.run()),
+    ("financeiro: fluxo de caixa", "financeiro", lambda at: at.run()),
+    ("financeiro: gestão & recibos", "financeiro", secao("Gestão & Recibos")),
+    ("financeiro: novo contrato", "financeiro", secao("Novo Contrato")),
+    ("financeiro: relatórios", "financeiro", secao("Relatórios")),
+    ("cadastro", "cadastro", cadastro),
+]
+
+
+def medir(banco, pagina, interacao):
+    at = abrir(pagina)
+    banco.idas_ao_banco.clear()
+    t0 = time.perf_counter(); interacao(at); dt = (time.perf_counter() - t0) * 1000
+    if at.exception: raise RuntimeError(at.exception[0].value)
+    return sum(banco.idas_ao_banco.values()), dt, dict(banco.idas_ao_banco)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Idas ao banco e tempo por tela, sobre o banco local")
+    ap.add_argument("--clientes", type=int, default=50_000)
+    ap.add_argument("--caixa", type=int, default=200_000)
+    ap.add_argument("--parcelas", type=int, default=100_000)
+    ap.add_argument("--detalhe", action="store_true", help="mostra as idas ao banco por tabela")
+    args = ap.parse_args()
+
+    banco = banco_local(BANCO)
+    t0 = time.perf_counter()
+    popular(banco, args.clientes, args.caixa, args.parcelas, date.today())
+    print(f"banco populado em {time.perf_counter() - t0:.1f}s: {args.clientes} clientes, {args.caixa} movimentos de caixa, {args.parcelas} parcelas\n")
+
+    print(f"{'tela':<30} | {'idas (frio)':>11} | {'frio (ms)':>9} | {'idas (quente)':>13} | {'quente (ms)':>11}")
+    for nome, pagina, interacao in TELAS:
+        st.cache_data.clear()
+        frio, t_frio, detalhe = medir(banco, pagina, interacao)
+        quente, t_quente, _ = medir(banco, pagina, interacao)
+        print(f"{nome:<30} | {frio:>11} | {t_frio:>9.0f} | {quente:>13} | {t_quente:>11.0f}")
+        if args.detalhe: print(f"{'':<30}   {detalhe}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+# Importação e exportação em lote: clientes (com processos) e caixa.
+#
+# A planilha (CSV ou Excel) é lida em blocos de TAMANHO_LOTE_IMPORTACAO linhas. Cada bloco é
+# validado e normalizado de uma vez com pandas (CPF, datas, valores) e enviado ao banco numa
+# única chamada (funções importar_clientes / importar_caixa): fora a contagem de movimentos
+# repetidos do caixa (uma chave curta por movimento distinto), a memória usada não depende do
+# tamanho do arquivo. A exportação pagina a tabela pelo id e grava linha a linha num BytesIO
+# (o download_button guarda o arquivo inteiro em memória de qualquer forma). Não depende de
+# Streamlit.
+import csv
+import io
+import itertools
+import re
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+
+from repositorio import normalizar_busca
+
+TAMANHO_LOTE_IMPORTACAO = 300
+
+COLUNAS_IMPORTACAO = {
+    "clientes": ["nome", "cpf", "email", "colaborador", "data_nascimento", "tipo_beneficio", "numero_requerimento", "status_processo", "esfera", "processo_id"],
+    "caixa": ["data_movimentacao", "tipo", "valor", "descricao", "forma_pagamento", "usuario_responsavel"],
+}
+OBRIGATORIAS = {"clientes": ["nome", "cpf"], "caixa": ["data_movimentacao", "tipo", "valor"]}
+TIPOS_CAIXA = {"entrada": "Entrada", "e": "Entrada", "saida": "Saída", "s": "Saída"}
+ESFERAS = {"administrativo": "Administrativo", "judicial": "Judicial"}
+# Cabeçalhos comuns em planilhas feitas à mão -> nome da coluna
+SINONIMOS = {
+    "e_mail": "email", "data_de_nascimento": "data_nascimento", "nascimento": "data_nascimento",
+    "beneficio": "tipo_beneficio", "tipo_de_beneficio": "tipo_beneficio", "servico": "tipo_beneficio",
+    "nb": "numero_requerimento", "numero_do_requerimento": "numero_requerimento", "requerimento": "numero_requerimento",
+    "status": "status_processo", "data": "data_movimentacao", "forma": "forma_pagamento", "forma_de_pagamento": "forma_pagamento",
+    "usuario": "usuario_responsavel", "id_processo": "processo_id",
+}
+
+# --- LEITURA ---
+def normalizar_cabecalho(nome):
+    # "Data de Nascimento" -> "data_nascimento"; "CPF " -> "cpf"
+    nome = re.sub(r'[^a-z0-9]+', '_', normalizar_busca(str(nome))).strip('_')
+    return SINONIMOS.get(nome, nome)
+
+def ler_planilha(arquivo, nome_arquivo, codificacao="utf-8-sig", tamanho=TAMANHO_LOTE_IMPORTACAO):
+    # Blocos de DataFrame com os cabeçalhos normalizados
+    if nome_arquivo.lower().endswith(".xlsx"): blocos = _ler_excel(arquivo, tamanho)
+    else: blocos = pd.read_csv(arquivo, sep=None, engine="python", dtype=str, keep_default_na=False, encoding=codificacao, chunksize=tamanho)
+    for bloco in blocos:
+        bloco.columns = [normalizar_cabecalho(c) for c in bloco.columns]
+        yield bloco
+
+def _ler_excel(arquivo, tamanho):
+    # Modo somente leitura do openpyxl: as linhas saem do arquivo sob demanda
+    livro = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        linhas = livro.active.iter_rows(values_only=True)
+        cabecalho = next(linhas, None)
+        if cabecalho is None: return
+        for lote in iter(lambda: list(itertools.islice(linhas, tamanho)), []):
+            # Número inteiro digitado na célula (ex.: CPF sem máscara) não vira "12345678909.0";
+            # dtype=object: sem ele, uma célula vazia na coluna faz o pandas passar tudo a float
+            yield pd.DataFrame([[int(v) if isinstance(v, float) and v.is_integer() else v for v in linha] for linha in lote], columns=cabecalho, dtype=object)
+    finally: livro.close()
+
+# --- VALIDAÇÃO ---
+def _texto(bloco, coluna):
+    # Coluna como texto sem espaços nas pontas; célula vazia ou coluna ausente -> NA
+    if coluna not in bloco: return pd.Series(pd.NA, index=bloco.index, dtype="string")
+    texto = bloco[coluna].astype("string").str.strip()
+    return texto.mask(texto == "")
+
+def _sem_acento(texto):
+    return texto.str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii").str.lower()
+
+PESOS_DV1 = np.arange(10, 1, -1)
+PESOS_DV2 = np.arange(11, 1, -1)
+
+def validar_cpfs(digitos):
+    # True onde há 11 dígitos, não todos iguais, com os dois dígitos verificadores certos
+    onze = digitos.str.len().eq(11).fillna(False).to_numpy(bool)
+    validos = np.zeros(len(digitos), dtype=bool)
+    if onze.any():
+        m = (np.frombuffer("".join(digitos[onze]).encode(), dtype=np.uint8).reshape(-1, 11) - 48).astype(int)
+        dv1 = (m[:, :9] @ PESOS_DV1 * 10) % 11 % 10
+        dv2 = (m[:, :10] @ PESOS_DV2 * 10) % 11 % 10
+        validos[onze] = (dv1 == m[:, 9]) & (dv2 == m[:, 10]) & (m != m[:, :1]).any(axis=1)
+    return validos
+
+def converter_datas(texto, formatos):
+    # Tenta cada formato na coluna inteira; o primeiro que reconhecer a célula vale.
+    # Tudo em UTC: "2026-10-18T10:00:00+00:00" (exportação do Postgres) e data sem fuso
+    # (digitada, ou do banco local) cabem na mesma coluna
+    datas = pd.Series(pd.NaT, index=texto.index, dtype="datetime64[ns, UTC]")
+    for formato in formatos:
+        datas = datas.fillna(pd.to_datetime(texto, format=formato, errors="coerce", utc=True))
+    return datas
+
+def formatar_data_hora_iso(datas):
+    # Como datetime.isoformat(), que o app usa ao lançar no caixa: sem fuso (o do banco é UTC)
+    # e com os microssegundos só quando houver. Truncar para segundos faria o movimento
+    # exportado não casar com ele mesmo na reimportação.
+    return datas.dt.strftime("%Y-%m-%dT%H:%M:%S.%f").astype("string").str.replace(r"\.0{6}$", "", regex=True)
+
+def converter_valores(texto):
+    # "R$ 1.234,56", "1234,56", "1234.56"
+    limpo = texto.str.replace(r"[R$\s]", "", regex=True)
+    virgula = limpo.str.contains(",", regex=False).fillna(False)
+    limpo = limpo.where(~virgula, limpo.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    return pd.to_numeric(limpo, errors="coerce")
+
+def _separar(bloco, primeira_linha, valores, motivos):
+    # (linhas válidas prontas para o banco, DataFrame das rejeitadas com linha e motivo)
+    linhas = pd.Series(range(primeira_linha, primeira_linha + len(bloco)), index=bloco.index)
+    motivo = pd.Series("", index=bloco.index)
+    for descricao, erro in motivos: motivo = motivo.where(~erro, motivo + descricao + "; ")
+    ok = motivo.eq("")
+    validos = valores[ok].astype(object).where(valores[ok].notna(), None).to_dict("records")
+    rejeitados = bloco[~ok].assign(linha=linhas[~ok], motivo=motivo[~ok].str.rstrip("; "))
+    return validos, rejeitados[["linha", "motivo"] + [c for c in bloco.columns if c not in ("linha", "motivo")]]
+
+def validar_clientes(bloco, primeira_linha):
+    valores = pd.DataFrame({c: _texto(bloco, c) for c in COLUNAS_IMPORTACAO["clientes"]})
+    # CPF gravado com máscara; célula numérica do Excel perde zeros à esquerda
+    digitos = valores["cpf"].str.replace(r"\D", "", regex=True)
+    digitos = digitos.where(~digitos.str.len().between(9, 10).fillna(False), digitos.str.zfill(11))
+    cpf_ok = validar_cpfs(digitos)
+    valores["cpf"] = digitos.str[:3] + "." + digitos.str[3:6] + "." + digitos.str[6:9] + "-" + digitos.str[9:]
+    nascimento = converter_datas(valores["data_nascimento"], ["%d/%m/%Y", "ISO8601"])
+    valores["data_nascimento"] = nascimento.dt.strftime("%Y-%m-%d").astype("string")
+    esfera = _sem_acento(valores["esfera"]).map(ESFERAS)
+    valores["esfera"] = esfera.astype("string")
+    valores["email"] = valores["email"].str.lower()
+    # processo_id vem da exportação de processos: casa o processo mesmo sem NB
+    processo_ok = valores["processo_id"].str.fullmatch(r"\d+").fillna(False).astype(bool)
+    valores["processo_id"] = pd.to_numeric(valores["processo_id"].where(processo_ok)).astype("Int64")
+    return _separar(bloco, primeira_linha, valores, [
+        ("nome vazio", valores["nome"].isna()),
+        ("CPF inválido", ~pd.Series(cpf_ok, index=bloco.index)),
+        ("data de nascimento inválida", _texto(bloco, "data_nascimento").notna() & nascimento.isna()),
+        ("esfera deve ser Administrativo ou Judicial", _texto(bloco, "esfera").notna() & esfera.isna()),
+        ("processo_id deve ser um número", _texto(bloco, "processo_id").notna() & ~processo_ok),
+    ])
+
+def validar_caixa(bloco, primeira_linha):
+    valores = pd.DataFrame({c: _texto(bloco, c) for c in COLUNAS_IMPORTACAO["caixa"]})
+    data = converter_datas(valores["data_movimentacao"], ["%d/%m/%Y %H:%M", "%d/%m/%Y", "ISO8601"])
+    valores["data_movimentacao"] = formatar_data_hora_iso(data)
+    tipo = _sem_acento(valores["tipo"]).map(TIPOS_CAIXA)
+    valores["tipo"] = tipo.astype("string")
+    valor = converter_valores(valores["valor"])
+    valores["valor"] = valor.round(2)
+    valores["linha"] = range(primeira_linha, primeira_linha + len(bloco))  # volta na resposta de importar_caixa
+    return _separar(bloco, primeira_linha, valores, [
+        ("data inválida", data.isna()),
+        ("tipo deve ser Entrada ou Saída", tipo.isna()),
+        ("valor inválido", ~(valor > 0)),
+    ])
+
+VALIDADORES = {"clientes": validar_clientes, "caixa": validar_caixa}
+MOTIVO_JA_LANCADO = "movimento já lançado no caixa (mesma data, tipo, valor e descrição)"
+
+def colunas_faltando(bloco, tipo):
+    return [c for c in OBRIGATORIAS[tipo] if c not in bloco.columns]
+
+# --- IMPORTAÇÃO ---
+def _numerar_ocorrencias(validos, ocorrencias):
+    # Caixa: n-ésima vez que o mesmo movimento aparece no arquivo inteiro (não só no bloco).
+    # importar_caixa só grava a n-ésima ocorrência se o caixa ainda tiver menos de n iguais.
+    for linha in validos:
+        chave = (linha["data_movimentacao"], linha["tipo"], linha["valor"], linha["descricao"])
+        ocorrencias[chave] += 1; linha["ocorrencia"] = ocorrencias[chave]
+
+def _ja_lancadas(bloco, primeira_linha, linhas, colunas):
+    rej = bloco.iloc[[l - primeira_linha for l in linhas]].assign(linha=linhas, motivo=MOTIVO_JA_LANCADO)
+    return rej[colunas]
+
+def importar(repo, tipo, blocos, usuario, ao_avancar=None):
+    # Valida e grava bloco a bloco. Devolve (totais, DataFrame das linhas rejeitadas).
+    # Só as rejeitadas ficam em memória, para o relatório de erros.
+    totais = Counter(); rejeitados = []; ocorrencias = Counter(); primeira_linha = 2  # linha 1 é o cabeçalho
+    for bloco in blocos:
+        faltando = colunas_faltando(bloco, tipo)
+        if faltando: raise ValueError(f"Colunas obrigatórias ausentes: {', '.join(faltando)}")
+        validos, rej = VALIDADORES[tipo](bloco, primeira_linha)
+        if validos and tipo == "clientes": totais.update(repo.importar_clientes(validos))
+        elif validos:
+            _numerar_ocorrencias(validos, ocorrencias)
+            res = repo.importar_caixa(validos, usuario); totais["inseridos"] += res["inseridos"]
+            if res["ja_lancadas"]: rej = pd.concat([rej, _ja_lancadas(bloco, primeira_linha, res["ja_lancadas"], rej.columns)]).sort_values("linha")
+        if len(rej): rejeitados.append(rej)
+        totais["lidas"] += len(bloco); totais["rejeitadas"] += len(rej); primeira_linha += len(bloco)
+        if ao_avancar: ao_avancar(totais)
+    return dict(totais), pd.concat(rejeitados, ignore_index=True) if rejeitados else pd.DataFrame(columns=["linha", "motivo"])
+
+# --- EXPORTAÇÃO ---
+def _achatar(linha):
+    # processos: {"clientes": {"nome", "cpf"}} -> colunas nome e cpf; id -> processo_id,
+    # para a planilha voltar na importação de clientes atualizando os mesmos processos
+    # Dict novo: iterar_por_id ainda lê o id da última linha da página
+    if "clientes" not in linha: return linha
+    cliente = linha["clientes"] or {}
+    return {"nome": cliente.get("nome"), "cpf": cliente.get("cpf"), "processo_id": linha.get("id"), **{c: v for c, v in linha.items() if c not in ("id", "clientes")}}
+
+def exportar(linhas, formato="csv"):
+    # linhas: iterável de dicts (ex.: Repositorio.exportar). Devolve um BytesIO posicionado
+    # no início, um dos tipos que o st.download_button aceita de uma função
+    arquivo = io.BytesIO()
+    linhas = map(_achatar, linhas)
+    primeira = next(linhas, None)
+    colunas = list(primeira) if primeira else []
+    if formato == "xlsx":
+        livro = Workbook(write_only=True); planilha = livro.create_sheet()
+        planilha.append(colunas)
+        for linha in itertools.chain([primeira] if primeira else [], linhas): planilha.append([linha.get(c) for c in colunas])
+        livro.save(arquivo)
+    else:
+        texto = io.TextIOWrapper(arquivo, encoding="utf-8-sig", newline="")
+        escritor = csv.DictWriter(texto, colunas, delimiter=";", extrasaction="ignore")
+        escritor.writeheader()
+        for linha in itertools.chain([primeira] if primeira else [], linhas): escritor.writerow(linha)
+        texto.flush(); texto.detach()
+    arquivo.seek(0)
+    return arquivo
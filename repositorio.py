@@ -0,0 +1,794 @@
+# Acesso a dados do escritório.
+#
+# Repositorio reúne todas as operações de tabela e funções (RPC) usadas pelas telas e
+# fala com qualquer cliente no estilo postgrest (table(...).select(...).eq(...).execute(), rpc(...)):
+#   - produção: cliente supabase-py (criar_cliente_supabase)
+#   - desenvolvimento, testes e benchmarks: BancoLocal, o mesmo esquema em SQLite, com as
+#     funções do banco (supabase/migrations) reimplementadas sobre ele
+# Não depende de Streamlit: cache e sessão ficam no app.
+import contextvars
+import itertools
+import json
+import logging
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from time import perf_counter
+
+import httpx
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+from postgrest.exceptions import APIError
+from supabase import create_client, ClientOptions
+
+# --- MEDIÇÃO DE LATÊNCIA ---
+# Faixas do histograma, em milissegundos
+FAIXAS_LATENCIA_MS = [25, 50, 100, 250, 500, 1000, 2500]
+
+class HistogramaLatencia:
+    # Contagem de chamadas por tabela e faixa de latência; compartilhado entre sessões
+    def __init__(self):
+        self._trava = threading.Lock()
+        self._por_tabela = {}
+
+    def registrar(self, tabela, ms):
+        faixa = next((i for i, limite in enumerate(FAIXAS_LATENCIA_MS) if ms <= limite), len(FAIXAS_LATENCIA_MS))
+        with self._trava:
+            dados_tab = self._por_tabela.setdefault(tabela, {"contagens": [0] * (len(FAIXAS_LATENCIA_MS) + 1), "total_ms": 0.0, "max_ms": 0.0})
+            dados_tab["contagens"][faixa] += 1; dados_tab["total_ms"] += ms; dados_tab["max_ms"] = max(dados_tab["max_ms"], ms)
+
+    def como_dataframe(self):
+        rotulos = [f"≤{limite}ms" for limite in FAIXAS_LATENCIA_MS] + [f">{FAIXAS_LATENCIA_MS[-1]}ms"]
+        with self._trava:
+            linhas = []
+            for tabela, dados_tab in sorted(self._por_tabela.items()):
+                n = sum(dados_tab["contagens"])
+                linhas.append({"Tabela": tabela, "Chamadas": n, "Média (ms)": round(dados_tab["total_ms"] / n, 1), "Máx (ms)": round(dados_tab["max_ms"], 1), **dict(zip(rotulos, dados_tab["contagens"]))})
+        return pd.DataFrame(linhas)
+
+# Execução atual (página, número): um rerun do Streamlit ou de um fragmento. O app abre
+# cada execução com iniciar_execucao(); as consultas seguintes ficam ligadas a ela.
+_execucao_atual = contextvars.ContextVar("execucao_consultas", default=("", 0))
+_numero_execucao = itertools.count(1)
+
+def iniciar_execucao(pagina):
+    _execucao_atual.set((pagina, next(_numero_execucao)))
+
+# Uma linha JSON por consulta quando o logger está em INFO (ver LOG_CONSULTAS no app)
+log_consultas = logging.getLogger("escritorio.consultas")
+
+class RegistroConsultas:
+    # Últimas consultas (tabela, operação, linhas, bytes, duração) com a página e a execução
+    # que as disparou; compartilhado entre sessões, limitado às mais recentes.
+    # bytes só é medido com medir_tamanho ligado (LOG_CONSULTAS ou a tela de diagnóstico):
+    # serializar cada resposta de novo custa caro nas listagens grandes
+    def __init__(self, limite=5000):
+        self._trava = threading.Lock()
+        self._itens = deque(maxlen=limite)
+        self.medir_tamanho = False
+
+    def registrar(self, tabela, operacao, linhas, tamanho, ms):
+        pagina, execucao = _execucao_atual.get()
+        item = {"quando": datetime.now().isoformat(timespec='seconds'), "pagina": pagina, "execucao": execucao, "tabela": tabela, "operacao": operacao, "linhas": linhas, "bytes": tamanho, "ms": round(ms, 1)}
+        with self._trava: self._itens.append(item)
+        if log_consultas.isEnabledFor(logging.INFO): log_consultas.info(json.dumps(item, ensure_ascii=False))
+
+    def como_dataframe(self):
+        with self._trava: itens = list(self._itens)
+        df = pd.DataFrame(itens, columns=["quando", "pagina", "execucao", "tabela", "operacao", "linhas", "bytes", "ms"])
+        df["bytes"] = pd.to_numeric(df["bytes"]); return df
+
+def _tamanho_resposta(dados):
+    # Tamanho aproximado do corpo devolvido (JSON), em bytes
+    if dados is None: return 0
+    return len(json.dumps(dados, default=str, ensure_ascii=False).encode())
+
+OPERACOES = ('select', 'insert', 'update', 'upsert', 'delete')
+
+class _ConsultaMedida:
+    # Envolve o construtor de consulta do cliente e mede o execute(): tempo, linhas e bytes
+    def __init__(self, consulta, tabela, cliente, operacao):
+        self._consulta = consulta; self._tabela = tabela; self._cliente = cliente; self._operacao = operacao
+
+    def __getattr__(self, nome):
+        attr = getattr(self._consulta, nome)
+        if not callable(attr): return attr
+        operacao = nome if nome in OPERACOES else self._operacao
+        def encadear(*args, **kwargs):
+            res = attr(*args, **kwargs)
+            return _ConsultaMedida(res, self._tabela, self._cliente, operacao) if hasattr(res, 'execute') else res
+        return encadear
+
+    def execute(self):
+        inicio = perf_counter(); res = None
+        try:
+            res = self._consulta.execute()
+            return res
+        finally:
+            ms = (perf_counter() - inicio) * 1000; dados = getattr(res, 'data', None)
+            self._cliente.histograma.registrar(self._tabela, ms)
+            self._cliente.registro.registrar(self._tabela, self._operacao, len(dados) if isinstance(dados, list) else int(dados is not None), _tamanho_resposta(dados) if self._cliente.registro.medir_tamanho else None, ms)
+
+class ClienteMedido:
+    def __init__(self, cliente, histograma):
+        self._cliente = cliente; self.histograma = histograma; self.registro = RegistroConsultas()
+
+    def table(self, nome):
+        return _ConsultaMedida(self._cliente.table(nome), nome, self, None)
+
+    def rpc(self, fn, params=None, **kwargs):
+        return _ConsultaMedida(self._cliente.rpc(fn, params, **kwargs), f"rpc:{fn}", self, 'rpc')
+
+    def __getattr__(self, nome):
+        return getattr(self._cliente, nome)
+
+# --- CONEXÃO COM O SUPABASE ---
+def criar_cliente_supabase(url, key, timeout, max_conexoes):
+    # Pool HTTP (keep-alive) próprio, para ser criado uma vez por processo e reaproveitado
+    http = httpx.Client(
+        timeout=httpx.Timeout(timeout, connect=min(timeout, 5.0)),
+        limits=httpx.Limits(max_connections=max_conexoes, max_keepalive_connections=max_conexoes, keepalive_expiry=60.0),
+    )
+    return create_client(url, key, options=ClientOptions(httpx_client=http, postgrest_client_timeout=timeout))
+
+# Falhas de gravação/leitura: resposta de erro do PostgREST, rede/timeout, ou o banco local
+ERROS_BANCO = (APIError, httpx.HTTPError, sqlite3.Error)
+
+# --- BANCO LOCAL (SQLITE) ---
+# Mesmas tabelas, índices e gatilhos das migrações, em SQLite. Datas ficam em texto ISO,
+# então os filtros gte/lt por data comparam como no Postgres.
+ESQUEMA_LOCAL = """
+create table if not exists usuarios (id integer primary key, nome text, usuario text unique, senha text, perfil text);
+create table if not exists clientes (id integer primary key, nome text, cpf text, email text, senha_meu_inss text, colaborador text, data_nascimento text, status_geral text default 'Ativo', motivo_arquivamento text);
+create table if not exists processos (id integer primary key, cliente_id integer references clientes(id), tipo_beneficio text, numero_requerimento text, status_processo text, esfera text);
+create table if not exists agendamentos (id integer primary key, processo_id integer references processos(id), tipo_evento text, data_hora text, local_cidade text, status_comparecimento text, atualizado_em text not null default (strftime('%Y-%m-%dT%H:%M:%f', 'now')));
+create table if not exists caixa (id integer primary key, tipo text, valor real, descricao text, usuario_responsavel text, forma_pagamento text, data_movimentacao text default (strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')), atualizado_em text not null default (strftime('%Y-%m-%dT%H:%M:%f', 'now')));
+create table if not exists contratos (id integer primary key, processo_id integer references processos(id), valor_total real, valor_entrada real, qtd_parcelas integer, tipo_cobranca text);
+create table if not exists parcelas (id integer primary key, contrato_id integer references contratos(id), numero_parcela integer, valor_parcela real, data_vencimento text, data_pagamento text, valor_pago real, forma_pagamento text);
+create table if not exists caixa_saldos_diarios (dia text not null, forma_pagamento text not null, entradas real not null default 0, saidas real not null default 0, movimentos integer not null default 0, primary key (dia, forma_pagamento));
+create table if not exists registros_excluidos (tabela text not null, registro_id integer not null, excluido_em text not null default (strftime('%Y-%m-%dT%H:%M:%f', 'now')));
+create table if not exists resumo_lembretes (id integer primary key, tipo text not null, data text not null, cliente text, descricao text, quantidade integer not null default 1, valor real, gerado_em text not null default (strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')));
+
+create index if not exists idx_agendamentos_data_hora on agendamentos (data_hora);
+create index if not exists idx_agendamentos_processo_id on agendamentos (processo_id);
+create index if not exists idx_caixa_data_movimentacao on caixa (data_movimentacao desc);
+create index if not exists idx_parcelas_pendentes_vencimento on parcelas (data_vencimento, id) where data_pagamento is null;
+create index if not exists idx_parcelas_contrato_id on parcelas (contrato_id);
+create index if not exists idx_processos_cliente_id on processos (cliente_id);
+create index if not exists idx_contratos_processo_id on contratos (processo_id);
+create index if not exists idx_clientes_nome on clientes (nome);
+create index if not exists idx_clientes_cpf_somente_digitos on clientes (somente_digitos(cpf));
+create index if not exists idx_processos_cliente_nb on processos (cliente_id, somente_digitos(numero_requerimento));
+create index if not exists idx_resumo_lembretes_tipo_data on resumo_lembretes (tipo, data);
+create index if not exists idx_agendamentos_atualizado_em on agendamentos (atualizado_em);
+create index if not exists idx_caixa_atualizado_em on caixa (atualizado_em);
+create index if not exists idx_registros_excluidos_tabela_em on registros_excluidos (tabela, excluido_em);
+
+create trigger if not exists trg_caixa_saldos_ins after insert on caixa begin
+    insert into caixa_saldos_diarios (dia, forma_pagamento, entradas, saidas, movimentos)
+    values (substr(new.data_movimentacao, 1, 10), coalesce(nullif(new.forma_pagamento, ''), 'Não informado'),
+            case when new.tipo = 'Entrada' then coalesce(new.valor, 0) else 0 end, case when new.tipo = 'Entrada' then 0 else coalesce(new.valor, 0) end, 1)
+    on conflict (dia, forma_pagamento) do update set entradas = entradas + excluded.entradas, saidas = saidas + excluded.saidas, movimentos = movimentos + excluded.movimentos;
+end;
+create trigger if not exists trg_caixa_saldos_del after delete on caixa begin
+    insert into caixa_saldos_diarios (dia, forma_pagamento, entradas, saidas, movimentos)
+    values (substr(old.data_movimentacao, 1, 10), coalesce(nullif(old.forma_pagamento, ''), 'Não informado'),
+            case when old.tipo = 'Entrada' then -coalesce(old.valor, 0) else 0 end, case when old.tipo = 'Entrada' then 0 else -coalesce(old.valor, 0) end, -1)
+    on conflict (dia, forma_pagamento) do update set entradas = entradas + excluded.entradas, saidas = saidas + excluded.saidas, movimentos = movimentos + excluded.movimentos;
+end;
+create trigger if not exists trg_caixa_saldos_upd after update of tipo, valor, forma_pagamento, data_movimentacao on caixa begin
+    insert into caixa_saldos_diarios (dia, forma_pagamento, entradas, saidas, movimentos)
+    values (substr(old.data_movimentacao, 1, 10), coalesce(nullif(old.forma_pagamento, ''), 'Não informado'),
+            case when old.tipo = 'Entrada' then -coalesce(old.valor, 0) else 0 end, case when old.tipo = 'Entrada' then 0 else -coalesce(old.valor, 0) end, -1)
+    on conflict (dia, forma_pagamento) do update set entradas = entradas + excluded.entradas, saidas = saidas + excluded.saidas, movimentos = movimentos + excluded.movimentos;
+    insert into caixa_saldos_diarios (dia, forma_pagamento, entradas, saidas, movimentos)
+    values (substr(new.data_movimentacao, 1, 10), coalesce(nullif(new.forma_pagamento, ''), 'Não informado'),
+            case when new.tipo = 'Entrada' then coalesce(new.valor, 0) else 0 end, case when new.tipo = 'Entrada' then 0 else coalesce(new.valor, 0) end, 1)
+    on conflict (dia, forma_pagamento) do update set entradas = entradas + excluded.entradas, saidas = saidas + excluded.saidas, movimentos = movimentos + excluded.movimentos;
+end;
+create trigger if not exists trg_agendamentos_atualizado_em after update on agendamentos when new.atualizado_em is old.atualizado_em begin
+    update agendamentos set atualizado_em = strftime('%Y-%m-%dT%H:%M:%f', 'now') where id = new.id;
+end;
+create trigger if not exists trg_agendamentos_exclusao after delete on agendamentos begin
+    insert into registros_excluidos (tabela, registro_id) values ('agendamentos', old.id);
+    delete from registros_excluidos where tabela = 'agendamentos' and excluido_em < strftime('%Y-%m-%dT%H:%M:%f', 'now', '-1 day');
+end;
+create trigger if not exists trg_caixa_atualizado_em after update on caixa when new.atualizado_em is old.atualizado_em begin
+    update caixa set atualizado_em = strftime('%Y-%m-%dT%H:%M:%f', 'now') where id = new.id;
+end;
+create trigger if not exists trg_caixa_exclusao after delete on caixa begin
+    insert into registros_excluidos (tabela, registro_id) values ('caixa', old.id);
+    delete from registros_excluidos where tabela = 'caixa' and excluido_em < strftime('%Y-%m-%dT%H:%M:%f', 'now', '-1 day');
+end;
+"""
+
+# Embeds do select ("*, processos(id, clientes(nome))"):
+# (tabela, relação) -> (tabela da relação, coluna local, coluna remota, devolve lista?)
+RELACOES = {
+    ('clientes', 'processos'): ('processos', 'id', 'cliente_id', True),
+    ('processos', 'clientes'): ('clientes', 'cliente_id', 'id', False),
+    ('processos', 'agendamentos'): ('agendamentos', 'id', 'processo_id', True),
+    ('processos', 'contratos'): ('contratos', 'id', 'processo_id', True),
+    ('agendamentos', 'processos'): ('processos', 'processo_id', 'id', False),
+    ('contratos', 'processos'): ('processos', 'processo_id', 'id', False),
+    ('contratos', 'parcelas'): ('parcelas', 'id', 'contrato_id', True),
+    ('parcelas', 'contratos'): ('contratos', 'contrato_id', 'id', False),
+}
+
+OPERADORES = {'eq': '=', 'neq': '<>', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+
+def normalizar_busca(texto):
+    # Mesmo papel de normalizar_busca() no banco: minúsculas e sem acentos
+    return ''.join(c for c in unicodedata.normalize('NFKD', texto or '') if not unicodedata.combining(c)).lower()
+
+def somente_digitos(texto):
+    return re.sub(r'\D', '', texto or '')
+
+def _coluna(nome):
+    if not re.fullmatch(r'[a-z_][a-z0-9_]*', nome): raise ValueError(f"Coluna inválida: {nome}")
+    return f'"{nome}"'
+
+def _partes(texto):
+    # Separa por vírgulas de nível zero: "a, b(c, d)" -> ["a", "b(c, d)"]
+    partes, nivel, atual = [], 0, ""
+    for ch in texto:
+        if ch == "," and nivel == 0: partes.append(atual.strip()); atual = ""; continue
+        nivel += (ch == "(") - (ch == ")"); atual += ch
+    if atual.strip(): partes.append(atual.strip())
+    return partes
+
+def _arvore_select(texto):
+    # "*, processos(id, clientes(nome))" -> (["*"], {"processos": (["id"], {"clientes": (["nome"], {})})})
+    colunas, embutidos = [], {}
+    for parte in _partes(texto):
+        if "(" in parte:
+            nome, resto = parte.split("(", 1)
+            embutidos[nome.strip()] = _arvore_select(resto.rsplit(")", 1)[0])
+        else: colunas.append(parte)
+    return colunas, embutidos
+
+def _filtro_logico(expr, juncao):
+    # Sintaxe do or_/and_ do postgrest: "data_vencimento.gt.X,and(data_vencimento.eq.X,id.gt.Y)"
+    sqls, params = [], []
+    for parte in _partes(expr):
+        m = re.fullmatch(r'(and|or)\((.*)\)', parte)
+        if m: sql, p = _filtro_logico(m.group(2), m.group(1))
+        else:
+            col, op, valor = parte.split(".", 2)
+            if op == 'is': sql, p = f"{_coluna(col)} is null", []
+            elif op in ('like', 'ilike'): sql, p = f"{_coluna(col)} like ?", [valor.replace('*', '%')]
+            else: sql, p = f"{_coluna(col)} {OPERADORES[op]} ?", [valor]
+        sqls.append(f"({sql})"); params += p
+    return f" {juncao} ".join(sqls), params
+
+class _Resposta:
+    def __init__(self, data):
+        self.data = data; self.count = None
+
+class _ConsultaLocal:
+    # Subconjunto do construtor de consultas do postgrest usado pelo app, traduzido para SQL
+    def __init__(self, banco, tabela):
+        self.banco = banco; self.tabela = tabela
+        self.operacao = 'select'; self.colunas = '*'; self.valores = None
+        self.filtros = []; self.ordem = []; self.ordem_embutida = {}
+        self.inicio = 0; self.limite = None
+
+    def select(self, colunas="*", **_):
+        self.colunas = colunas; return self
+
+    def insert(self, valores, **_):
+        self.operacao = 'insert'; self.valores = valores; return self
+
+    def update(self, valores, **_):
+        self.operacao = 'update'; self.valores = valores; return self
+
+    def delete(self, **_):
+        self.operacao = 'delete'; return self
+
+    def _filtro(self, sql, *params):
+        self.filtros.append((sql, list(params))); return self
+
+    def eq(self, col, valor): return self._filtro(f"{_coluna(col)} = ?", valor)
+    def neq(self, col, valor): return self._filtro(f"{_coluna(col)} <> ?", valor)
+    def gt(self, col, valor): return self._filtro(f"{_coluna(col)} > ?", valor)
+    def gte(self, col, valor): return self._filtro(f"{_coluna(col)} >= ?", valor)
+    def lt(self, col, valor): return self._filtro(f"{_coluna(col)} < ?", valor)
+    def lte(self, col, valor): return self._filtro(f"{_coluna(col)} <= ?", valor)
+    def ilike(self, col, padrao): return self._filtro(f"{_coluna(col)} like ?", padrao)
+
+    def in_(self, col, valores):
+        valores = list(valores)
+        return self._filtro(f"{_coluna(col)} in ({', '.join('?' * len(valores)) or 'null'})", *valores)
+
+    def is_(self, col, valor):
+        return self._filtro(f"{_coluna(col)} is {'null' if valor in (None, 'null') else 'not null'}")
+
+    def or_(self, expr, **_):
+        sql, params = _filtro_logico(expr, 'or')
+        return self._filtro(sql, *params)
+
+    def order(self, col, desc=False, foreign_table=None, **_):
+        (self.ordem_embutida.setdefault(foreign_table, []) if foreign_table else self.ordem).append((col, desc)); return self
+
+    def limit(self, n, **_):
+        self.limite = n; return self
+
+    def range(self, inicio, fim, **_):
+        self.inicio = inicio; self.limite = fim - inicio + 1; return self
+
+    def _where(self):
+        if not self.filtros: return "", []
+        return " where " + " and ".join(f"({sql})" for sql, _ in self.filtros), [p for _, params in self.filtros for p in params]
+
+    def execute(self):
+        with self.banco.medir(self.tabela):
+            if self.operacao == 'insert': return _Resposta(self.banco.inserir(self.tabela, self.valores))
+            where, params = self._where()
+            if self.operacao == 'update':
+                sets = ", ".join(f"{_coluna(c)} = ?" for c in self.valores)
+                return _Resposta(self.banco.consultar(f"update {self.tabela} set {sets}{where} returning *", list(self.valores.values()) + params))
+            if self.operacao == 'delete':
+                return _Resposta(self.banco.consultar(f"delete from {self.tabela}{where} returning *", params))
+            sql = f"select * from {self.tabela}{where}"
+            if self.ordem: sql += " order by " + ", ".join(f"{_coluna(c)}{' desc' if d else ''}" for c, d in self.ordem)
+            if self.limite is not None or self.inicio: sql += f" limit {-1 if self.limite is None else int(self.limite)} offset {int(self.inicio)}"
+            colunas, embutidos = _arvore_select(self.colunas)
+            return _Resposta(self.banco.montar(self.tabela, self.banco.consultar(sql, params), colunas, embutidos, self.ordem_embutida))
+
+class _RpcLocal:
+    def __init__(self, banco, fn, params):
+        self.banco = banco; self.fn = fn; self.params = params
+
+    def execute(self):
+        with self.banco.medir(f"rpc:{self.fn}"):
+            return _Resposta(getattr(self.banco, f"rpc_{self.fn}")(**self.params))
+
+class BancoLocal:
+    # Cliente no formato do supabase-py sobre SQLite. Conta cada ida ao banco em
+    # idas_ao_banco (por tabela ou "rpc:<função>") para testes e benchmarks.
+    def __init__(self, caminho=":memory:"):
+        self.con = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        self.con.row_factory = sqlite3.Row
+        self.con.create_function("normalizar_busca", 1, normalizar_busca, deterministic=True)
+        self.con.create_function("somente_digitos", 1, somente_digitos, deterministic=True)
+        self.trava = threading.RLock()
+        self.idas_ao_banco = Counter()
+        self.con.executescript(ESQUEMA_LOCAL)
+
+    def table(self, nome):
+        return _ConsultaLocal(self, nome)
+
+    def rpc(self, fn, params=None, **_):
+        return _RpcLocal(self, fn, params or {})
+
+    @contextmanager
+    def medir(self, rotulo):
+        self.idas_ao_banco[rotulo] += 1
+        with self.trava: yield
+
+    @contextmanager
+    def transacao(self):
+        # Aninhada (ex.: inserir() dentro de uma função RPC) participa da transação de fora
+        with self.trava:
+            if self.con.in_transaction:
+                yield; return
+            self.con.execute("begin")
+            try: yield
+            except:
+                self.con.execute("rollback"); raise
+            self.con.execute("commit")
+
+    def consultar(self, sql, params=()):
+        with self.trava: return [dict(linha) for linha in self.con.execute(sql, params)]
+
+    def inserir(self, tabela, valores):
+        linhas = valores if isinstance(valores, list) else [valores]
+        with self.transacao():
+            return [self.consultar(f"insert into {tabela} ({', '.join(map(_coluna, linha))}) values ({', '.join('?' * len(linha))}) returning *", list(linha.values()))[0] for linha in linhas]
+
+    def inserir_em_massa(self, tabela, colunas, linhas):
+        # Carga direta (executemany numa transação), para popular bancos de teste grandes
+        with self.transacao():
+            self.con.executemany(f"insert into {tabela} ({', '.join(map(_coluna, colunas))}) values ({', '.join('?' * len(colunas))})", linhas)
+
+    def montar(self, tabela, linhas, colunas, embutidos, ordem_embutida):
+        # Projeta as colunas pedidas e resolve os embeds com uma consulta por relação (não por linha)
+        for relacao, (sub_colunas, sub_embutidos) in embutidos.items():
+            destino, local, remota, lista = RELACOES[(tabela, relacao)]
+            chaves = list({l[local] for l in linhas if l[local] is not None})
+            relacionadas = []
+            for i in range(0, len(chaves), 500):
+                lote = chaves[i:i + 500]
+                ordem = "".join(f", {_coluna(c)}{' desc' if d else ''}" for c, d in ordem_embutida.get(relacao, []))
+                relacionadas += self.consultar(f"select * from {destino} where {_coluna(remota)} in ({', '.join('?' * len(lote))}) order by {_coluna(remota)}{ordem}", lote)
+            chave_remota = [r[remota] for r in relacionadas]
+            relacionadas = self.montar(destino, relacionadas, sub_colunas, sub_embutidos, {})
+            agrupadas = {}
+            for chave, r in zip(chave_remota, relacionadas): agrupadas.setdefault(chave, []).append(r)
+            for l in linhas:
+                encontradas = agrupadas.get(l[local], [])
+                l[f"__{relacao}"] = encontradas if lista else (encontradas[0] if encontradas else None)
+        resultado = []
+        for l in linhas:
+            item = dict(l) if "*" in colunas else {c: l[c] for c in colunas}
+            for relacao in embutidos: item.pop(f"__{relacao}", None); item[relacao] = l[f"__{relacao}"]
+            resultado.append(item)
+        return resultado
+
+    # Funções do banco (supabase/migrations), com os mesmos parâmetros
+    def rpc_buscar_clientes(self, p_termo, p_limite=20, p_inicio=0):
+        sql = """
+            with encontrados as (
+                select id, 1.0 as pontos from clientes where length(:texto) >= 2 and instr(normalizar_busca(nome), :texto) > 0
+                union all
+                select id, case when somente_digitos(cpf) = :digitos then 3.0 else 2.0 end from clientes
+                where length(:digitos) >= 3 and instr(somente_digitos(cpf), :digitos) > 0
+                union all
+                select cliente_id, case when somente_digitos(numero_requerimento) = :digitos then 3.0 else 2.0 end from processos
+                where length(:digitos) >= 3 and instr(somente_digitos(numero_requerimento), :digitos) > 0
+            )
+            select c.*, max(e.pontos) as relevancia from encontrados e join clientes c on c.id = e.id
+            group by c.id order by relevancia desc, c.nome, c.id limit :limite offset :inicio"""
+        linhas = self.consultar(sql, {"texto": normalizar_busca(p_termo), "digitos": somente_digitos(p_termo), "limite": p_limite, "inicio": p_inicio})
+        relevancias = [l.pop('relevancia') for l in linhas]
+        colunas, embutidos = _arvore_select(f"{COLUNAS_CLIENTE_CARTAO}, processos({COLUNAS_PROCESSO_CARTAO})")
+        clientes = self.montar('clientes', linhas, colunas, embutidos, {"processos": [("id", False)]})
+        return [{"id": c['id'], "nome": c['nome'], "relevancia": r, "cliente": c} for c, r in zip(clientes, relevancias)]
+
+    def rpc_cadastrar_cliente_completo(self, p_cliente, p_processo, p_agendamentos=None):
+        with self.transacao():
+            cliente = self.inserir('clientes', {k: p_cliente.get(k) for k in ("nome", "cpf", "email", "senha_meu_inss", "colaborador", "data_nascimento")})[0]
+            processo = self.inserir('processos', {"cliente_id": cliente['id'], **{k: p_processo.get(k) for k in ("tipo_beneficio", "numero_requerimento", "status_processo", "esfera")}})[0]
+            for a in p_agendamentos or []:
+                self.inserir('agendamentos', {"processo_id": processo['id'], **{k: a.get(k) for k in ("tipo_evento", "data_hora", "local_cidade", "status_comparecimento")}})
+        return {"cliente_id": cliente['id'], "processo_id": processo['id']}
+
+    def rpc_gerar_contrato_fixo(self, p_processo_id, p_valor_total, p_valor_entrada, p_qtd_parcelas, p_descricao_entrada, p_usuario, p_parcelas):
+        with self.transacao():
+            contrato = self.inserir('contratos', {"processo_id": p_processo_id, "valor_total": p_valor_total, "valor_entrada": p_valor_entrada, "qtd_parcelas": p_qtd_parcelas, "tipo_cobranca": "Fixa"})[0]
+            if p_valor_entrada > 0:
+                self.inserir('caixa', {"tipo": "Entrada", "descricao": p_descricao_entrada, "valor": p_valor_entrada, "forma_pagamento": "Dinheiro", "usuario_responsavel": p_usuario})
+            if p_parcelas:
+                self.inserir('parcelas', [{"contrato_id": contrato['id'], "numero_parcela": p['numero_parcela'], "valor_parcela": p['valor_parcela'], "data_vencimento": p['data_vencimento'], "forma_pagamento": "Pendente"} for p in p_parcelas])
+        return contrato['id']
+
+    def rpc_resumo_parcelas_pendentes(self, p_hoje):
+        semana = (date.fromisoformat(p_hoje) + timedelta(days=7)).isoformat()
+        somas = {l['faixa']: l for l in self.consultar("""
+            select case when data_vencimento < ? then 'Vencidas' when data_vencimento < ? then 'Vencem nesta semana' else 'Vencem depois' end as faixa,
+                   count(*) as quantidade, coalesce(sum(valor_parcela), 0) as valor
+            from parcelas where data_pagamento is null group by 1""", [p_hoje, semana])}
+        return [somas.get(faixa, {"faixa": faixa, "quantidade": 0, "valor": 0}) for faixa in FAIXAS_VENCIMENTO]
+
+    def rpc_baixar_parcelas(self, p_ids, p_forma_pagamento, p_usuario, p_data=None):
+        with self.transacao():
+            marcadores = ", ".join('?' * len(p_ids)) or 'null'
+            abertas = self.consultar(f"""
+                select pa.id, pa.numero_parcela, pa.valor_parcela, coalesce(cl.nome, 'Desconhecido') as nome
+                from parcelas pa left join contratos c on c.id = pa.contrato_id left join processos pr on pr.id = c.processo_id left join clientes cl on cl.id = pr.cliente_id
+                where pa.id in ({marcadores}) and pa.data_pagamento is null order by pa.id""", list(p_ids))
+            for p in abertas:
+                self.consultar("update parcelas set data_pagamento = ?, valor_pago = valor_parcela, forma_pagamento = ? where id = ?", [p_data or date.today().isoformat(), p_forma_pagamento, p['id']])
+            if abertas:
+                self.inserir('caixa', [{"tipo": "Entrada", "descricao": f"Receb. Parc {p['numero_parcela']} - {p['nome']}", "valor": p['valor_parcela'], "usuario_responsavel": p_usuario, "forma_pagamento": p_forma_pagamento} for p in abertas])
+        return len(abertas)
+
+    def rpc_saldo_caixa_ate(self, p_dia):
+        return self.consultar("select coalesce(sum(entradas - saidas), 0) as saldo from caixa_saldos_diarios where dia < ?", [p_dia])[0]['saldo']
+
+    def rpc_painel_indicadores(self, p_hoje):
+        hoje = date.fromisoformat(p_hoje); inicio_mes = hoje.replace(day=1)
+        limites = [(hoje - timedelta(days=d)).isoformat() for d in (0, 30, 60, 90)]
+        return {
+            "processos": self.consultar("""
+                select p.status_processo, p.esfera, p.tipo_beneficio, count(*) as quantidade
+                from processos p join clientes c on c.id = p.cliente_id
+                where c.status_geral is not 'Arquivado' group by 1, 2, 3 order by quantidade desc"""),
+            "parcelas": self.consultar("""
+                select case when data_vencimento >= ? then 0 when data_vencimento >= ? then 1 when data_vencimento >= ? then 2 when data_vencimento >= ? then 3 else 4 end as ordem,
+                       count(*) as quantidade, sum(valor_parcela) as valor
+                from parcelas where data_pagamento is null group by 1 order by 1""", limites),
+            "vencidas_mes": self.consultar("""
+                select count(*) as quantidade, coalesce(sum(valor_parcela), 0) as valor from parcelas
+                where data_pagamento is null and data_vencimento >= ? and data_vencimento < ?""", [inicio_mes.isoformat(), p_hoje])[0],
+            "caixa_mensal": self.consultar("""
+                select substr(dia, 1, 7) || '-01' as mes, sum(entradas) as entradas, sum(saidas) as saidas
+                from caixa_saldos_diarios where dia >= ? group by 1 order by 1""", [(inicio_mes - relativedelta(months=11)).isoformat()]),
+        }
+
+    def rpc_alteracoes_agendamentos(self, p_desde=None):
+        return self._alteracoes('agendamentos', COLUNAS_AGENDA, p_desde)
+
+    def rpc_alteracoes_caixa(self, p_desde=None):
+        return self._alteracoes('caixa', COLUNAS_CAIXA, p_desde)
+
+    def _alteracoes(self, tabela, colunas, p_desde):
+        agora = self.consultar("select strftime('%Y-%m-%dT%H:%M:%f', 'now') as agora")[0]['agora']
+        if p_desde is None: return {"agora": agora, "linhas": [], "excluidos": []}
+        linhas = self.consultar(f"select * from {tabela} where atualizado_em > ? order by atualizado_em", [p_desde])
+        excluidos = self.consultar("select registro_id from registros_excluidos where tabela = ? and excluido_em > ?", [tabela, p_desde])
+        return {"agora": agora, "linhas": self.montar(tabela, linhas, *_arvore_select(colunas), {}), "excluidos": [e['registro_id'] for e in excluidos]}
+
+    def rpc_importar_clientes(self, p_linhas):
+        totais = {"inseridos": 0, "atualizados": 0, "processos": 0}
+        with self.transacao():
+            for l in p_linhas:
+                existente = self.consultar("select id from clientes where somente_digitos(cpf) = ? order by id limit 1", [somente_digitos(l.get('cpf'))])
+                if existente:
+                    cliente_id = existente[0]['id']
+                    self.consultar("""update clientes set nome = coalesce(?, nome), email = coalesce(?, email), colaborador = coalesce(?, colaborador),
+                                      data_nascimento = coalesce(?, data_nascimento) where id = ?""", [l.get('nome'), l.get('email'), l.get('colaborador'), l.get('data_nascimento'), cliente_id])
+                    totais["atualizados"] += 1
+                else:
+                    cliente_id = self.inserir('clientes', {k: l.get(k) for k in ("nome", "cpf", "email", "colaborador", "data_nascimento")})[0]['id']
+                    totais["inseridos"] += 1
+                if l.get('tipo_beneficio') is None and l.get('numero_requerimento') is None: continue
+                nb = somente_digitos(l.get('numero_requerimento'))
+                processo = self.consultar("select id from processos where id = ? and cliente_id = ?", [l['processo_id'], cliente_id]) if l.get('processo_id') is not None else []
+                if not processo and nb:
+                    processo = self.consultar("select id from processos where cliente_id = ? and somente_digitos(numero_requerimento) = ? order by id limit 1", [cliente_id, nb])
+                elif not processo and l.get('tipo_beneficio') is not None:
+                    processo = self.consultar("select id from processos where cliente_id = ? and tipo_beneficio = ? and somente_digitos(numero_requerimento) = '' order by id limit 1", [cliente_id, l['tipo_beneficio']])
+                if processo:
+                    self.consultar("""update processos set tipo_beneficio = coalesce(?, tipo_beneficio), numero_requerimento = coalesce(?, numero_requerimento),
+                                      status_processo = coalesce(?, status_processo), esfera = coalesce(?, esfera) where id = ?""",
+                                   [l.get('tipo_beneficio'), l.get('numero_requerimento'), l.get('status_processo'), l.get('esfera'), processo[0]['id']])
+                else:
+                    self.inserir('processos', {"cliente_id": cliente_id, "tipo_beneficio": l.get('tipo_beneficio'), "numero_requerimento": l.get('numero_requerimento'),
+                                               "status_processo": l.get('status_processo') or 'Em Análise', "esfera": l.get('esfera') or 'Administrativo'})
+                totais["processos"] += 1
+        return totais
+
+    def rpc_importar_caixa(self, p_linhas, p_usuario):
+        with self.transacao():
+            # Contagem antes de inserir o bloco, como o snapshot do Postgres. Datas comparadas
+            # como instante (julianday), não como texto: "…T10:00:00" = "…T10:00:00.000"
+            ja_lancadas = {l['linha'] for l in p_linhas if self.consultar(
+                "select count(*) n from caixa where julianday(data_movimentacao) = julianday(?) and tipo = ? and valor = ? and descricao is ?",
+                [l['data_movimentacao'], l['tipo'], l['valor'], l.get('descricao')])[0]['n'] >= l['ocorrencia']}
+            novas = [l for l in p_linhas if l['linha'] not in ja_lancadas]
+            if novas: self.inserir('caixa', [{**{k: l.get(k) for k in ("data_movimentacao", "tipo", "valor", "descricao", "forma_pagamento")}, "usuario_responsavel": l.get('usuario_responsavel') or p_usuario} for l in novas])
+        return {"inseridos": len(novas), "ja_lancadas": sorted(ja_lancadas)}
+
+_bancos_locais = {}
+_trava_bancos_locais = threading.Lock()
+
+def banco_local(caminho=":memory:"):
+    # Uma instância por caminho no processo: o app e um benchmark no mesmo processo
+    # enxergam o mesmo banco, inclusive o ":memory:"
+    with _trava_bancos_locais:
+        if caminho not in _bancos_locais: _bancos_locais[caminho] = BancoLocal(caminho)
+        return _bancos_locais[caminho]
+
+# --- REPOSITÓRIO ---
+TAMANHO_LOTE = 500
+FAIXAS_VENCIMENTO = ["Vencidas", "Vencem nesta semana", "Vencem depois"]
+
+def iterar_em_lotes(montar_consulta, tamanho=TAMANHO_LOTE):
+    # montar_consulta() devolve uma consulta nova, já filtrada e com ordem estável;
+    # as linhas saem lote a lote, sem materializar o resultado inteiro.
+    inicio = 0
+    while True:
+        lote = montar_consulta().range(inicio, inicio + tamanho - 1).execute().data
+        yield from lote
+        if len(lote) < tamanho: break
+        inicio += tamanho
+
+def iterar_por_id(montar_consulta, tamanho=TAMANHO_LOTE):
+    # Como iterar_em_lotes, mas cada página começa depois do último id da anterior
+    # (sem OFFSET): o custo por página não cresce ao varrer uma tabela inteira.
+    ultimo = None
+    while True:
+        q = montar_consulta()
+        if ultimo is not None: q = q.gt('id', ultimo)
+        lote = q.order('id').limit(tamanho).execute().data
+        yield from lote
+        if len(lote) < tamanho: break
+        ultimo = lote[-1]['id']
+
+# Colunas de cada consulta: só o que as telas exibem (nada de select("*")). senha_meu_inss
+# fica de fora das listas e é lida à parte, quando o formulário de edição é aberto.
+COLUNAS_USUARIO_SESSAO = "id, nome, usuario, perfil"
+COLUNAS_CLIENTE_CARTAO = "id, nome, cpf, email, status_geral, motivo_arquivamento"
+COLUNAS_PROCESSO_CARTAO = "id, tipo_beneficio, numero_requerimento, status_processo, esfera"
+COLUNAS_AGENDA = "id, data_hora, tipo_evento, local_cidade, status_comparecimento, processos(clientes(nome))"
+COLUNAS_CAIXA = "id, data_movimentacao, tipo, descricao, valor, usuario_responsavel"
+# Exportação: sem senha_meu_inss; processos levam nome e CPF do cliente, no mesmo formato
+# aceito pela importação de clientes
+COLUNAS_EXPORTACAO = {
+    "clientes": "id, nome, cpf, email, colaborador, data_nascimento, status_geral",
+    "processos": "id, tipo_beneficio, numero_requerimento, status_processo, esfera, clientes(nome, cpf)",
+    "caixa": "id, data_movimentacao, tipo, valor, descricao, forma_pagamento, usuario_responsavel",
+}
+COLUNAS_PARCELA = "id, numero_parcela, valor_parcela, data_vencimento, contratos(processos(clientes(nome)))"
+
+# --- VISÕES INCREMENTAIS ---
+# Cópia local das linhas de uma tela (agenda do mês, caixa do dia), guardada na sessão do app.
+# A primeira leitura traz o período inteiro; as seguintes, só o que mudou desde a anterior
+# (funções alteracoes_<tabela>: atualizado_em e registros_excluidos, mantidos por gatilho).
+# A margem repete alguns segundos já vistos, para não perder transações que carimbaram
+# a linha antes da última leitura mas só confirmaram depois; reaplicar uma linha é inofensivo.
+MARGEM_ALTERACOES = timedelta(seconds=10)
+# As exclusões ficam no banco por 1 dia: uma visão parada há mais tempo que isso recarrega
+VALIDADE_VISAO = timedelta(hours=12)
+
+class VisaoIncremental:
+    def __init__(self, tabela, colunas, coluna_data, inicio, fim, decrescente=False):
+        # Período [inicio, fim) em coluna_data, comparado como texto ISO (como o filtro no banco)
+        self.tabela = tabela; self.colunas = colunas; self.coluna_data = coluna_data
+        self.inicio = inicio.isoformat(); self.fim = fim.isoformat(); self.decrescente = decrescente
+        self.chave = (tabela, self.inicio, self.fim)
+        self.linhas = {}; self.visto = None; self.carregada_em = None
+
+    def vencida(self):
+        return self.visto is None or datetime.now() - self.carregada_em > VALIDADE_VISAO
+
+    def pertence(self, linha):
+        return self.inicio <= (linha.get(self.coluna_data) or "") < self.fim
+
+    def recarregar(self, linhas, agora):
+        self.linhas = {l['id']: l for l in linhas}; self.visto = agora; self.carregada_em = datetime.now()
+
+    def aplicar(self, alteracoes):
+        # Linha alterada que saiu do período (ex.: remarcada para outro mês) sai da visão
+        for l in alteracoes['linhas']:
+            if self.pertence(l): self.linhas[l['id']] = l
+            else: self.linhas.pop(l['id'], None)
+        for registro_id in alteracoes['excluidos']: self.linhas.pop(registro_id, None)
+        self.visto = alteracoes['agora']
+
+    def dados(self):
+        return sorted(self.linhas.values(), key=lambda l: (l[self.coluna_data], l['id']), reverse=self.decrescente)
+
+class Repositorio:
+    def __init__(self, cliente):
+        self.cliente = cliente
+
+    # Usuários
+    def autenticar(self, usuario, senha):
+        return self.cliente.table('usuarios').select(COLUNAS_USUARIO_SESSAO).eq('usuario', usuario).eq('senha', senha).execute().data
+
+    def obter_usuario(self, usuario_id):
+        return self.cliente.table('usuarios').select("id, nome").eq('id', usuario_id).execute().data[0]
+
+    def criar_usuario(self, dados):
+        return self.cliente.table('usuarios').insert(dados).execute().data
+
+    def atualizar_usuario(self, usuario_id, dados):
+        return self.cliente.table('usuarios').update(dados).eq('id', usuario_id).execute().data
+
+    # Clientes e processos
+    def listar_clientes(self):
+        return self.cliente.table('clientes').select("id, nome").order('nome').execute().data
+
+    def listar_processos_cliente(self, cliente_id):
+        return self.cliente.table('processos').select("id, tipo_beneficio, numero_requerimento").eq('cliente_id', cliente_id).execute().data
+
+    def buscar_clientes(self, termo, limite):
+        # Uma única ida ao banco (função buscar_clientes): nome sem acento, CPF ou NB,
+        # ordenado por relevância, com os processos embutidos (colunas do cartão).
+        # Pede limite+1 linhas só para saber se existe próxima página.
+        res = self.cliente.rpc('buscar_clientes', {"p_termo": termo, "p_limite": limite + 1, "p_inicio": 0}).execute()
+        dados = [r['cliente'] for r in res.data]
+        return dados[:limite], len(dados) > limite
+
+    def cliente_com_processos(self, cliente_id):
+        return self.cliente.table('clientes').select(f"{COLUNAS_CLIENTE_CARTAO}, processos({COLUNAS_PROCESSO_CARTAO})").eq('id', cliente_id).order('id', foreign_table='processos').execute().data[0]
+
+    def senha_inss_cliente(self, cliente_id):
+        return self.cliente.table('clientes').select("senha_meu_inss").eq('id', cliente_id).execute().data[0]['senha_meu_inss']
+
+    def atualizar_cliente(self, cliente_id, dados):
+        return self.cliente.table('clientes').update(dados).eq('id', cliente_id).execute().data
+
+    def inserir_processo(self, dados):
+        return self.cliente.table('processos').insert(dados).execute().data
+
+    def atualizar_processo(self, processo_id, dados):
+        return self.cliente.table('processos').update(dados).eq('id', processo_id).execute().data
+
+    def cadastrar_cliente_completo(self, cliente, processo, agendamentos):
+        # Cliente, processo e agendamentos numa transação só (função cadastrar_cliente_completo)
+        return self.cliente.rpc('cadastrar_cliente_completo', {"p_cliente": cliente, "p_processo": processo, "p_agendamentos": agendamentos}).execute().data
+
+    # Agenda
+    def _consulta_agendamentos_mes(self, mes, ano):
+        # Filtra o mês no banco (intervalo [início, início do mês seguinte) em data_hora,
+        # coberto pelo índice idx_agendamentos_data_hora) em vez de trazer o histórico inteiro.
+        inicio = date(ano, mes, 1); fim = inicio + relativedelta(months=1)
+        return self.cliente.table('agendamentos').select(COLUNAS_AGENDA).gte('data_hora', inicio.isoformat()).lt('data_hora', fim.isoformat()).order('data_hora')
+
+    def visao_agendamentos_mes(self, mes, ano):
+        inicio = date(ano, mes, 1)
+        return VisaoIncremental('agendamentos', COLUNAS_AGENDA, 'data_hora', inicio, inicio + relativedelta(months=1))
+
+    def iterar_agendamentos_mes(self, mes, ano):
+        return iterar_em_lotes(lambda: self._consulta_agendamentos_mes(mes, ano).order('id'))
+
+    # Caixa
+    def iterar_caixa_periodo(self, inicio, fim):
+        fim_exclusivo = fim + timedelta(days=1)
+        return iterar_em_lotes(lambda: self.cliente.table('caixa').select(COLUNAS_CAIXA).gte('data_movimentacao', inicio.isoformat()).lt('data_movimentacao', fim_exclusivo.isoformat()).order('data_movimentacao').order('id'))
+
+    def visao_caixa_periodo(self, inicio, fim):
+        return VisaoIncremental('caixa', COLUNAS_CAIXA, 'data_movimentacao', inicio, fim + timedelta(days=1), decrescente=True)
+
+    def lancar_caixa(self, dados):
+        return self.cliente.table('caixa').insert(dados).execute().data
+
+    def saldo_caixa_ate(self, dia):
+        return float(self.cliente.rpc('saldo_caixa_ate', {"p_dia": dia.isoformat()}).execute().data or 0)
+
+    def saldos_diarios(self, inicio, fim):
+        # Totais por dia e forma de pagamento (caixa_saldos_diarios, mantida por gatilho)
+        return list(iterar_em_lotes(lambda: self.cliente.table('caixa_saldos_diarios').select("dia, forma_pagamento, entradas, saidas, movimentos").gte('dia', inicio.isoformat()).lte('dia', fim.isoformat()).gt('movimentos', 0).order('dia').order('forma_pagamento')))
+
+    # Visões incrementais
+    def alteracoes(self, tabela, desde):
+        # {agora, linhas, excluidos} desde o instante informado; sem instante, só "agora"
+        p_desde = (datetime.fromisoformat(desde) - MARGEM_ALTERACOES).isoformat() if desde else None
+        return self.cliente.rpc(f'alteracoes_{tabela}', {"p_desde": p_desde}).execute().data
+
+    def atualizar_visao(self, visao):
+        # Carga completa na primeira vez (marcando o instante antes de ler); depois, só o delta
+        if visao.vencida():
+            agora = self.alteracoes(visao.tabela, None)['agora']
+            linhas = iterar_em_lotes(lambda: self.cliente.table(visao.tabela).select(visao.colunas).gte(visao.coluna_data, visao.inicio).lt(visao.coluna_data, visao.fim).order(visao.coluna_data).order('id'))
+            visao.recarregar(linhas, agora)
+        else: visao.aplicar(self.alteracoes(visao.tabela, visao.visto))
+        return visao.dados()
+
+    # Contratos e parcelas
+    def parcelas_pendentes(self, faixa, cursor=None, limite=20, hoje=None):
+        # Paginação por chave (data_vencimento, id): cada página começa depois da última linha
+        # da anterior, sem OFFSET, usando o índice parcial de parcelas não pagas.
+        hoje = hoje or date.today(); semana = hoje + timedelta(days=7)
+        q = self.cliente.table('parcelas').select(COLUNAS_PARCELA).is_("data_pagamento", "null")
+        if faixa == "Vencidas": q = q.lt('data_vencimento', hoje.isoformat())
+        elif faixa == "Vencem nesta semana": q = q.gte('data_vencimento', hoje.isoformat()).lt('data_vencimento', semana.isoformat())
+        else: q = q.gte('data_vencimento', semana.isoformat())
+        if cursor:
+            venc, ultimo_id = cursor
+            q = q.or_(f"data_vencimento.gt.{venc},and(data_vencimento.eq.{venc},id.gt.{ultimo_id})")
+        dados = q.order('data_vencimento').order('id').limit(limite + 1).execute().data
+        return dados[:limite], len(dados) > limite
+
+    def resumo_parcelas_pendentes(self, hoje):
+        # {faixa: (quantidade, valor)} calculado no banco
+        res = self.cliente.rpc('resumo_parcelas_pendentes', {"p_hoje": hoje.isoformat()}).execute()
+        return {r['faixa']: (r['quantidade'], float(r['valor'])) for r in res.data}
+
+    def baixar_parcelas(self, ids, forma_pagamento, usuario):
+        # Uma transação no banco (função baixar_parcelas): marca as parcelas ainda abertas como
+        # pagas e lança as entradas no caixa. Devolve quantas foram baixadas.
+        return self.cliente.rpc('baixar_parcelas', {"p_ids": list(ids), "p_forma_pagamento": forma_pagamento, "p_usuario": usuario}).execute().data
+
+    def gerar_contrato_fixo(self, processo_id, valor_total, valor_entrada, qtd_parcelas, descricao_entrada, usuario, parcelas):
+        # Contrato, entrada no caixa e parcelas numa transação só (função gerar_contrato_fixo)
+        return self.cliente.rpc('gerar_contrato_fixo', {"p_processo_id": processo_id, "p_valor_total": valor_total, "p_valor_entrada": valor_entrada, "p_qtd_parcelas": qtd_parcelas, "p_descricao_entrada": descricao_entrada, "p_usuario": usuario, "p_parcelas": parcelas}).execute().data
+
+    def inserir_contrato(self, dados):
+        return self.cliente.table('contratos').insert(dados).execute().data
+
+    # Importação e exportação
+    def importar_clientes(self, linhas):
+        # Um bloco de linhas já validadas, numa transação (função importar_clientes)
+        return self.cliente.rpc('importar_clientes', {"p_linhas": linhas}).execute().data
+
+    def importar_caixa(self, linhas, usuario):
+        # {"inseridos", "ja_lancadas": [linhas da planilha ignoradas]}
+        return self.cliente.rpc('importar_caixa', {"p_linhas": linhas, "p_usuario": usuario}).execute().data
+
+    def exportar(self, tabela):
+        return iterar_por_id(lambda: self.cliente.table(tabela).select(COLUNAS_EXPORTACAO[tabela]))
+
+    # Menu
+    def resumo_lembretes(self):
+        return self.cliente.table('resumo_lembretes').select("tipo, data, cliente, descricao, quantidade, valor, gerado_em").order('tipo').order('data').execute().data
+
+    def painel_indicadores(self, hoje):
+        return self.cliente.rpc('painel_indicadores', {"p_hoje": hoje.isoformat()}).execute().data
@@ -0,0 +1,6 @@
+-- Agenda: a tela filtra o mês com data_hora >= início e data_hora < início do mês seguinte,
+-- ordenando por data_hora. Este índice atende o filtro e a ordenação sem varrer o histórico.
+create index if not exists idx_agendamentos_data_hora on public.agendamentos (data_hora);
+
+-- O embed processos(clientes(nome)) resolve a junção pela chave estrangeira.
+create index if not exists idx_agendamentos_processo_id on public.agendamentos (processo_id);
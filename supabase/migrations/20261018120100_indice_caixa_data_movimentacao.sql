@@ -0,0 +1,3 @@
+-- Fluxo de Caixa: o dia (ou período) escolhido é filtrado com
+-- data_movimentacao >= início e data_movimentacao < fim, ordenado do mais recente.
+create index if not exists idx_caixa_data_movimentacao on public.caixa (data_movimentacao desc);
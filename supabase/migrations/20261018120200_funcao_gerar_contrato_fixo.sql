@@ -0,0 +1,36 @@
+-- "Gerar Contrato Fixo": contrato, lançamento da entrada no caixa e todas as parcelas
+-- numa única chamada. A função roda numa só transação: se qualquer insert falhar,
+-- nada é gravado.
+--
+-- p_parcelas: [{"numero_parcela": 1, "valor_parcela": 250.0, "data_vencimento": "2026-11-10"}, ...]
+create or replace function public.gerar_contrato_fixo(
+    p_processo_id bigint,
+    p_valor_total numeric,
+    p_valor_entrada numeric,
+    p_qtd_parcelas integer,
+    p_descricao_entrada text,
+    p_usuario text,
+    p_parcelas jsonb
+) returns bigint
+language plpgsql
+as $$
+declare
+    v_contrato_id bigint;
+begin
+    insert into public.contratos (processo_id, valor_total, valor_entrada, qtd_parcelas, tipo_cobranca)
+    values (p_processo_id, p_valor_total, p_valor_entrada, p_qtd_parcelas, 'Fixa')
+    returning id into v_contrato_id;
+
+    if p_valor_entrada > 0 then
+        insert into public.caixa (tipo, descricao, valor, forma_pagamento, usuario_responsavel)
+        values ('Entrada', p_descricao_entrada, p_valor_entrada, 'Dinheiro', p_usuario);
+    end if;
+
+    insert into public.parcelas (contrato_id, numero_parcela, valor_parcela, data_vencimento, forma_pagamento)
+    select v_contrato_id, x.numero_parcela, x.valor_parcela, x.data_vencimento, 'Pendente'
+    from jsonb_to_recordset(coalesce(p_parcelas, '[]'::jsonb))
+        as x(numero_parcela integer, valor_parcela numeric, data_vencimento date);
+
+    return v_contrato_id;
+end;
+$$;
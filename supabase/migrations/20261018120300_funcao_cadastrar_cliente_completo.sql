@@ -0,0 +1,40 @@
+-- "Novo Cadastro": cliente, processo e agendamentos iniciais numa única chamada.
+-- Tudo roda na mesma transação; se o processo ou um agendamento falhar,
+-- o cliente não fica gravado sozinho.
+--
+-- p_cliente:      {"nome", "cpf", "email", "senha_meu_inss", "colaborador", "data_nascimento"}
+-- p_processo:     {"tipo_beneficio", "numero_requerimento", "status_processo", "esfera"}
+-- p_agendamentos: [{"tipo_evento", "data_hora", "local_cidade", "status_comparecimento"}, ...]
+create or replace function public.cadastrar_cliente_completo(
+    p_cliente jsonb,
+    p_processo jsonb,
+    p_agendamentos jsonb default '[]'::jsonb
+) returns jsonb
+language plpgsql
+as $$
+declare
+    v_cliente_id bigint;
+    v_processo_id bigint;
+begin
+    insert into public.clientes (nome, cpf, email, senha_meu_inss, colaborador, data_nascimento)
+    values (
+        p_cliente->>'nome', p_cliente->>'cpf', p_cliente->>'email', p_cliente->>'senha_meu_inss',
+        p_cliente->>'colaborador', (p_cliente->>'data_nascimento')::date
+    )
+    returning id into v_cliente_id;
+
+    insert into public.processos (cliente_id, tipo_beneficio, numero_requerimento, status_processo, esfera)
+    values (
+        v_cliente_id, p_processo->>'tipo_beneficio', p_processo->>'numero_requerimento',
+        p_processo->>'status_processo', p_processo->>'esfera'
+    )
+    returning id into v_processo_id;
+
+    insert into public.agendamentos (processo_id, tipo_evento, data_hora, local_cidade, status_comparecimento)
+    select v_processo_id, a.tipo_evento, a.data_hora, a.local_cidade, a.status_comparecimento
+    from jsonb_to_recordset(coalesce(p_agendamentos, '[]'::jsonb))
+        as a(tipo_evento text, data_hora timestamp, local_cidade text, status_comparecimento text);
+
+    return jsonb_build_object('cliente_id', v_cliente_id, 'processo_id', v_processo_id);
+end;
+$$;
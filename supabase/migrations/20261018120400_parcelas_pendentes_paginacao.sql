@@ -0,0 +1,24 @@
+-- Parcelas Pendentes: paginação por chave (data_vencimento, id) só sobre as não pagas.
+create index if not exists idx_parcelas_pendentes_vencimento
+    on public.parcelas (data_vencimento, id)
+    where data_pagamento is null;
+
+-- Quantidade e valor das parcelas em aberto por faixa de vencimento, calculados no banco.
+-- Faixas: 'Vencidas' (antes de hoje), 'Vencem nesta semana' (hoje + 6 dias), 'Vencem depois'.
+create or replace function public.resumo_parcelas_pendentes(p_hoje date default current_date)
+returns table (faixa text, quantidade bigint, valor numeric)
+language sql
+stable
+as $$
+    select f.faixa, count(p.id), coalesce(sum(p.valor_parcela), 0)
+    from (values (1, 'Vencidas'), (2, 'Vencem nesta semana'), (3, 'Vencem depois')) as f(ordem, faixa)
+    left join public.parcelas p
+        on p.data_pagamento is null
+        and case
+            when p.data_vencimento < p_hoje then 'Vencidas'
+            when p.data_vencimento < p_hoje + 7 then 'Vencem nesta semana'
+            else 'Vencem depois'
+        end = f.faixa
+    group by f.ordem, f.faixa
+    order by f.ordem;
+$$;
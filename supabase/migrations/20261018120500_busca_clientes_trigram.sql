@@ -0,0 +1,66 @@
+-- Busca de clientes por nome (sem acento, tolerante a erro de digitação), CPF ou NB.
+-- ilike '%termo%' não usa índice btree e varre a tabela; aqui os índices GIN de
+-- trigramas atendem tanto o "contém" quanto a similaridade por palavra.
+create extension if not exists pg_trgm with schema extensions;
+create extension if not exists unaccent with schema extensions;
+
+-- Funções IMMUTABLE para poderem ser usadas nas expressões dos índices
+create or replace function public.normalizar_busca(texto text)
+returns text
+language sql immutable parallel safe
+as $$ select lower(extensions.unaccent('extensions.unaccent'::regdictionary, coalesce(texto, ''))) $$;
+
+create or replace function public.somente_digitos(texto text)
+returns text
+language sql immutable parallel safe
+as $$ select regexp_replace(coalesce(texto, ''), '\D', '', 'g') $$;
+
+create index if not exists idx_clientes_nome_busca
+    on public.clientes using gin (public.normalizar_busca(nome) extensions.gin_trgm_ops);
+create index if not exists idx_clientes_cpf_digitos
+    on public.clientes using gin (public.somente_digitos(cpf) extensions.gin_trgm_ops);
+create index if not exists idx_processos_nb_digitos
+    on public.processos using gin (public.somente_digitos(numero_requerimento) extensions.gin_trgm_ops);
+create index if not exists idx_processos_cliente_id on public.processos (cliente_id);
+
+-- Devolve uma página de clientes ordenada por relevância, cada um com seus processos
+-- embutidos em "cliente" (mesmo formato de clientes?select=*,processos(*)).
+-- Pontuação: CPF ou NB idênticos = 3; CPF ou NB contendo os dígitos = 2;
+-- nome contendo o termo = 1; nome parecido = similaridade por palavra (0 a 1).
+create or replace function public.buscar_clientes(p_termo text, p_limite integer default 20, p_inicio integer default 0)
+returns table (id bigint, nome text, relevancia real, cliente jsonb)
+language sql
+stable
+set search_path = public, extensions
+as $$
+    with termo as (
+        select normalizar_busca(p_termo) as texto, somente_digitos(p_termo) as digitos
+    ),
+    encontrados as (
+        select c.id,
+               case when normalizar_busca(c.nome) like '%' || t.texto || '%' then 1.0
+                    else word_similarity(t.texto, normalizar_busca(c.nome)) end as pontos
+        from clientes c, termo t
+        where length(t.texto) >= 2
+          and (normalizar_busca(c.nome) like '%' || t.texto || '%' or t.texto <% normalizar_busca(c.nome))
+        union all
+        select c.id, case when somente_digitos(c.cpf) = t.digitos then 3.0 else 2.0 end
+        from clientes c, termo t
+        where length(t.digitos) >= 3 and somente_digitos(c.cpf) like '%' || t.digitos || '%'
+        union all
+        select p.cliente_id, case when somente_digitos(p.numero_requerimento) = t.digitos then 3.0 else 2.0 end
+        from processos p, termo t
+        where length(t.digitos) >= 3 and somente_digitos(p.numero_requerimento) like '%' || t.digitos || '%'
+    ),
+    ranking as (
+        select e.id, max(e.pontos)::real as relevancia from encontrados e group by e.id
+    )
+    select c.id, c.nome, r.relevancia,
+           to_jsonb(c) || jsonb_build_object('processos', coalesce(
+               (select jsonb_agg(to_jsonb(p) order by p.id) from processos p where p.cliente_id = c.id),
+               '[]'::jsonb))
+    from ranking r
+    join clientes c on c.id = r.id
+    order by r.relevancia desc, c.nome, c.id
+    limit p_limite offset p_inicio;
+$$;
@@ -0,0 +1,70 @@
+-- Totais diários do caixa por forma de pagamento, mantidos por gatilho a cada
+-- insert/update/delete em caixa. Relatórios de período leem no máximo uma linha
+-- por dia e forma, em vez de todos os movimentos.
+create table if not exists public.caixa_saldos_diarios (
+    dia date not null,
+    forma_pagamento text not null,
+    entradas numeric not null default 0,
+    saidas numeric not null default 0,
+    movimentos integer not null default 0,
+    primary key (dia, forma_pagamento)
+);
+
+create or replace function public.caixa_somar_saldo_diario(
+    p_data timestamptz, p_forma text, p_tipo text, p_valor numeric, p_movimentos integer
+) returns void
+language sql
+as $$
+    insert into public.caixa_saldos_diarios as s (dia, forma_pagamento, entradas, saidas, movimentos)
+    values (
+        coalesce(p_data, now())::date,
+        coalesce(nullif(p_forma, ''), 'Não informado'),
+        case when p_tipo = 'Entrada' then coalesce(p_valor, 0) else 0 end,
+        case when p_tipo = 'Entrada' then 0 else coalesce(p_valor, 0) end,
+        p_movimentos
+    )
+    on conflict (dia, forma_pagamento) do update set
+        entradas = s.entradas + excluded.entradas,
+        saidas = s.saidas + excluded.saidas,
+        movimentos = s.movimentos + excluded.movimentos;
+$$;
+
+create or replace function public.caixa_atualizar_saldo_diario()
+returns trigger
+language plpgsql
+as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform public.caixa_somar_saldo_diario(old.data_movimentacao, old.forma_pagamento, old.tipo, -old.valor, -1);
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        perform public.caixa_somar_saldo_diario(new.data_movimentacao, new.forma_pagamento, new.tipo, new.valor, 1);
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists trg_caixa_saldos_diarios on public.caixa;
+create trigger trg_caixa_saldos_diarios
+    after insert or update or delete on public.caixa
+    for each row execute function public.caixa_atualizar_saldo_diario();
+
+-- Carga inicial com o histórico existente
+truncate public.caixa_saldos_diarios;
+insert into public.caixa_saldos_diarios (dia, forma_pagamento, entradas, saidas, movimentos)
+select coalesce(data_movimentacao, now())::date,
+       coalesce(nullif(forma_pagamento, ''), 'Não informado'),
+       sum(case when tipo = 'Entrada' then valor else 0 end),
+       sum(case when tipo = 'Entrada' then 0 else valor end),
+       count(*)
+from public.caixa
+group by 1, 2;
+
+-- Saldo acumulado de todos os dias anteriores a p_dia (saldo de abertura de um relatório)
+create or replace function public.saldo_caixa_ate(p_dia date)
+returns numeric
+language sql
+stable
+as $$
+    select coalesce(sum(entradas - saidas), 0) from public.caixa_saldos_diarios where dia < p_dia;
+$$;
@@ -0,0 +1,35 @@
+-- Baixa de várias parcelas numa única transação: marca como pagas as que ainda
+-- estão abertas e lança uma entrada no caixa para cada uma. Parcelas já pagas são
+-- ignoradas (clique duplo ou outra sessão não gera lançamento repetido).
+-- Devolve quantas parcelas foram baixadas.
+create or replace function public.baixar_parcelas(
+    p_ids bigint[],
+    p_forma_pagamento text,
+    p_usuario text,
+    p_data date default current_date
+) returns integer
+language plpgsql
+as $$
+declare
+    v_qtd integer;
+begin
+    with baixadas as (
+        update public.parcelas p
+        set data_pagamento = p_data, valor_pago = p.valor_parcela, forma_pagamento = p_forma_pagamento
+        where p.id = any(p_ids) and p.data_pagamento is null
+        returning p.id, p.numero_parcela, p.valor_parcela, p.contrato_id
+    )
+    insert into public.caixa (tipo, descricao, valor, usuario_responsavel, forma_pagamento, data_movimentacao)
+    select 'Entrada',
+           'Receb. Parc ' || b.numero_parcela || ' - ' || coalesce(cl.nome, 'Desconhecido'),
+           b.valor_parcela, p_usuario, p_forma_pagamento, now()
+    from baixadas b
+    left join public.contratos c on c.id = b.contrato_id
+    left join public.processos pr on pr.id = c.processo_id
+    left join public.clientes cl on cl.id = pr.cliente_id
+    order by b.id;
+
+    get diagnostics v_qtd = row_count;
+    return v_qtd;
+end;
+$$;
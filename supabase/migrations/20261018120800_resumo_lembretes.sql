@@ -0,0 +1,15 @@
+-- Resumo de lembretes gerado pelo worker_lembretes.py: próximas perícias/avaliações
+-- e parcelas vencidas agrupadas por cliente. O menu lê esta tabela pequena numa
+-- única consulta em vez de varrer agendamentos e parcelas a cada visita.
+create table if not exists public.resumo_lembretes (
+    id bigint generated always as identity primary key,
+    tipo text not null check (tipo in ('agendamento', 'parcela')),
+    data timestamptz not null,
+    cliente text,
+    descricao text,
+    quantidade integer not null default 1,
+    valor numeric,
+    gerado_em timestamptz not null default now()
+);
+
+create index if not exists idx_resumo_lembretes_tipo_data on public.resumo_lembretes (tipo, data);
@@ -0,0 +1,45 @@
+-- Indicadores do painel do menu numa única chamada (jsonb com agregados prontos):
+--   processos:    contagem por status_processo, esfera e tipo_beneficio (clientes não arquivados)
+--   parcelas:     parcelas em aberto por faixa de atraso (aging), com quantidade e valor
+--   vencidas_mes: parcelas em aberto que venceram no mês corrente
+--   caixa_mensal: entradas e saídas dos últimos 12 meses, lidas de caixa_saldos_diarios
+create or replace function public.painel_indicadores(p_hoje date default current_date)
+returns jsonb
+language sql
+stable
+as $$
+    select jsonb_build_object(
+        'processos', coalesce((
+            select jsonb_agg(x order by x.quantidade desc) from (
+                select p.status_processo, p.esfera, p.tipo_beneficio, count(*) as quantidade
+                from public.processos p
+                join public.clientes c on c.id = p.cliente_id
+                where c.status_geral is distinct from 'Arquivado'
+                group by 1, 2, 3
+            ) x), '[]'::jsonb),
+        'parcelas', coalesce((
+            select jsonb_agg(x order by x.ordem) from (
+                select case when data_vencimento >= p_hoje then 0
+                            when data_vencimento >= p_hoje - 30 then 1
+                            when data_vencimento >= p_hoje - 60 then 2
+                            when data_vencimento >= p_hoje - 90 then 3
+                            else 4 end as ordem,
+                       count(*) as quantidade, sum(valor_parcela) as valor
+                from public.parcelas
+                where data_pagamento is null
+                group by 1
+            ) x), '[]'::jsonb),
+        'vencidas_mes', (
+            select jsonb_build_object('quantidade', count(*), 'valor', coalesce(sum(valor_parcela), 0))
+            from public.parcelas
+            where data_pagamento is null
+              and data_vencimento >= date_trunc('month', p_hoje)::date and data_vencimento < p_hoje),
+        'caixa_mensal', coalesce((
+            select jsonb_agg(x order by x.mes) from (
+                select date_trunc('month', dia)::date as mes, sum(entradas) as entradas, sum(saidas) as saidas
+                from public.caixa_saldos_diarios
+                where dia >= (date_trunc('month', p_hoje) - interval '11 months')::date
+                group by 1
+            ) x), '[]'::jsonb)
+    );
+$$;
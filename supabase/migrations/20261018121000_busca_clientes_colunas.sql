@@ -0,0 +1,47 @@
+-- buscar_clientes devolvia to_jsonb(c) e to_jsonb(p): todas as colunas, inclusive
+-- senha_meu_inss, em cada resultado da busca. Agora "cliente" traz só as colunas do cartão
+-- (repositorio.COLUNAS_CLIENTE_CARTAO e COLUNAS_PROCESSO_CARTAO); a senha é lida à parte,
+-- quando o formulário de edição é aberto.
+create or replace function public.buscar_clientes(p_termo text, p_limite integer default 20, p_inicio integer default 0)
+returns table (id bigint, nome text, relevancia real, cliente jsonb)
+language sql
+stable
+set search_path = public, extensions
+as $$
+    with termo as (
+        select normalizar_busca(p_termo) as texto, somente_digitos(p_termo) as digitos
+    ),
+    encontrados as (
+        select c.id,
+               case when normalizar_busca(c.nome) like '%' || t.texto || '%' then 1.0
+                    else word_similarity(t.texto, normalizar_busca(c.nome)) end as pontos
+        from clientes c, termo t
+        where length(t.texto) >= 2
+          and (normalizar_busca(c.nome) like '%' || t.texto || '%' or t.texto <% normalizar_busca(c.nome))
+        union all
+        select c.id, case when somente_digitos(c.cpf) = t.digitos then 3.0 else 2.0 end
+        from clientes c, termo t
+        where length(t.digitos) >= 3 and somente_digitos(c.cpf) like '%' || t.digitos || '%'
+        union all
+        select p.cliente_id, case when somente_digitos(p.numero_requerimento) = t.digitos then 3.0 else 2.0 end
+        from processos p, termo t
+        where length(t.digitos) >= 3 and somente_digitos(p.numero_requerimento) like '%' || t.digitos || '%'
+    ),
+    ranking as (
+        select e.id, max(e.pontos)::real as relevancia from encontrados e group by e.id
+    )
+    select c.id, c.nome, r.relevancia,
+           jsonb_build_object(
+               'id', c.id, 'nome', c.nome, 'cpf', c.cpf, 'email', c.email,
+               'status_geral', c.status_geral, 'motivo_arquivamento', c.motivo_arquivamento,
+               'processos', coalesce(
+                   (select jsonb_agg(jsonb_build_object(
+                        'id', p.id, 'tipo_beneficio', p.tipo_beneficio, 'numero_requerimento', p.numero_requerimento,
+                        'status_processo', p.status_processo, 'esfera', p.esfera) order by p.id)
+                    from processos p where p.cliente_id = c.id),
+                   '[]'::jsonb))
+    from ranking r
+    join clientes c on c.id = r.id
+    order by r.relevancia desc, c.nome, c.id
+    limit p_limite offset p_inicio;
+$$;
@@ -0,0 +1,103 @@
+-- Leitura incremental da agenda e do caixa: em vez de baixar o mês (ou o dia) inteiro a
+-- cada rerun, o app guarda as linhas na sessão e pergunta só o que mudou desde a última
+-- leitura (repositorio.VisaoIncremental).
+--   atualizado_em:        carimbado por gatilho em todo insert/update
+--   registros_excluidos:  uma linha por exclusão (tabela, id), guardada por 1 dia
+--   alteracoes_<tabela>:  {agora, linhas, excluidos} desde p_desde, numa ida ao banco
+alter table public.agendamentos add column if not exists atualizado_em timestamptz not null default now();
+alter table public.caixa add column if not exists atualizado_em timestamptz not null default now();
+create index if not exists idx_agendamentos_atualizado_em on public.agendamentos (atualizado_em);
+create index if not exists idx_caixa_atualizado_em on public.caixa (atualizado_em);
+
+create table if not exists public.registros_excluidos (
+    tabela       text        not null,
+    registro_id  bigint      not null,
+    excluido_em  timestamptz not null default clock_timestamp()
+);
+create index if not exists idx_registros_excluidos_tabela_em on public.registros_excluidos (tabela, excluido_em);
+
+-- clock_timestamp() (e não now(), o início da transação) deixa o carimbo perto do commit
+create or replace function public.carimbar_atualizado_em()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.atualizado_em := clock_timestamp();
+    return new;
+end;
+$$;
+
+create or replace function public.registrar_exclusao()
+returns trigger
+language plpgsql
+as $$
+begin
+    insert into public.registros_excluidos (tabela, registro_id) values (tg_table_name, old.id);
+    delete from public.registros_excluidos where tabela = tg_table_name and excluido_em < now() - interval '1 day';
+    return old;
+end;
+$$;
+
+drop trigger if exists trg_agendamentos_atualizado_em on public.agendamentos;
+create trigger trg_agendamentos_atualizado_em
+    before insert or update on public.agendamentos
+    for each row execute function public.carimbar_atualizado_em();
+
+drop trigger if exists trg_caixa_atualizado_em on public.caixa;
+create trigger trg_caixa_atualizado_em
+    before insert or update on public.caixa
+    for each row execute function public.carimbar_atualizado_em();
+
+drop trigger if exists trg_agendamentos_exclusao on public.agendamentos;
+create trigger trg_agendamentos_exclusao
+    after delete on public.agendamentos
+    for each row execute function public.registrar_exclusao();
+
+drop trigger if exists trg_caixa_exclusao on public.caixa;
+create trigger trg_caixa_exclusao
+    after delete on public.caixa
+    for each row execute function public.registrar_exclusao();
+
+-- Linhas no mesmo formato do select da tela (repositorio.COLUNAS_AGENDA e COLUNAS_CAIXA).
+-- Com p_desde nulo devolve só "agora": a marca de partida de uma carga completa.
+create or replace function public.alteracoes_agendamentos(p_desde timestamptz default null)
+returns jsonb
+language sql
+stable
+as $$
+    select jsonb_build_object(
+        'agora', clock_timestamp(),
+        'linhas', coalesce((
+            select jsonb_agg(jsonb_build_object(
+                       'id', a.id, 'data_hora', a.data_hora, 'tipo_evento', a.tipo_evento,
+                       'local_cidade', a.local_cidade, 'status_comparecimento', a.status_comparecimento,
+                       'processos', case when p.id is null then null
+                                         else jsonb_build_object('clientes', case when c.id is null then null else jsonb_build_object('nome', c.nome) end) end)
+                   order by a.atualizado_em)
+            from public.agendamentos a
+            left join public.processos p on p.id = a.processo_id
+            left join public.clientes c on c.id = p.cliente_id
+            where a.atualizado_em > p_desde), '[]'::jsonb),
+        'excluidos', coalesce((
+            select jsonb_agg(e.registro_id) from public.registros_excluidos e
+            where e.tabela = 'agendamentos' and e.excluido_em > p_desde), '[]'::jsonb));
+$$;
+
+create or replace function public.alteracoes_caixa(p_desde timestamptz default null)
+returns jsonb
+language sql
+stable
+as $$
+    select jsonb_build_object(
+        'agora', clock_timestamp(),
+        'linhas', coalesce((
+            select jsonb_agg(jsonb_build_object(
+                       'id', cx.id, 'data_movimentacao', cx.data_movimentacao, 'tipo', cx.tipo,
+                       'descricao', cx.descricao, 'valor', cx.valor, 'usuario_responsavel', cx.usuario_responsavel)
+                   order by cx.atualizado_em)
+            from public.caixa cx
+            where cx.atualizado_em > p_desde), '[]'::jsonb),
+        'excluidos', coalesce((
+            select jsonb_agg(e.registro_id) from public.registros_excluidos e
+            where e.tabela = 'caixa' and e.excluido_em > p_desde), '[]'::jsonb));
+$$;
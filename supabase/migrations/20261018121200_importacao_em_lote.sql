@@ -0,0 +1,125 @@
+-- Importação em lote (tela Importar / Exportar, importacao.py). O app lê a planilha em
+-- blocos de algumas centenas de linhas, valida e normaliza cada bloco e envia o bloco
+-- inteiro numa chamada só.
+
+-- Casamento de clientes pelo CPF só com dígitos ("123.456.789-09" = "12345678909")
+create index if not exists idx_clientes_cpf_somente_digitos on public.clientes (public.somente_digitos(cpf));
+create index if not exists idx_processos_cliente_nb on public.processos (cliente_id, public.somente_digitos(numero_requerimento));
+
+-- p_linhas: [{"nome", "cpf", "email", "colaborador", "data_nascimento",
+--             "tipo_beneficio", "numero_requerimento", "status_processo", "esfera", "processo_id"}]
+-- Cliente com os mesmos dígitos de CPF é atualizado (célula vazia não apaga o que já existe);
+-- senão é inserido. Se a linha traz tipo_beneficio ou numero_requerimento, o processo é
+-- casado, nesta ordem, pelo processo_id (planilha exportada) do mesmo cliente, pelo cliente +
+-- dígitos do NB, ou, sem NB, pelo cliente + tipo_beneficio de um processo também sem NB.
+-- Devolve {"inseridos", "atualizados", "processos"}.
+create or replace function public.importar_clientes(p_linhas jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    l jsonb;
+    v_cliente_id bigint;
+    v_processo_id bigint;
+    v_inseridos integer := 0;
+    v_atualizados integer := 0;
+    v_processos integer := 0;
+begin
+    for l in select value from jsonb_array_elements(p_linhas) loop
+        select id into v_cliente_id from public.clientes
+        where public.somente_digitos(cpf) = public.somente_digitos(l->>'cpf')
+        order by id limit 1;
+
+        if v_cliente_id is null then
+            insert into public.clientes (nome, cpf, email, colaborador, data_nascimento)
+            values (l->>'nome', l->>'cpf', l->>'email', l->>'colaborador', (l->>'data_nascimento')::date)
+            returning id into v_cliente_id;
+            v_inseridos := v_inseridos + 1;
+        else
+            update public.clientes set
+                nome = coalesce(l->>'nome', nome),
+                email = coalesce(l->>'email', email),
+                colaborador = coalesce(l->>'colaborador', colaborador),
+                data_nascimento = coalesce((l->>'data_nascimento')::date, data_nascimento)
+            where id = v_cliente_id;
+            v_atualizados := v_atualizados + 1;
+        end if;
+
+        if coalesce(l->>'tipo_beneficio', l->>'numero_requerimento') is not null then
+            v_processo_id := null;
+            if l->>'processo_id' is not null then
+                select id into v_processo_id from public.processos
+                where id = (l->>'processo_id')::bigint and cliente_id = v_cliente_id;
+            end if;
+            if v_processo_id is null and public.somente_digitos(l->>'numero_requerimento') <> '' then
+                select id into v_processo_id from public.processos
+                where cliente_id = v_cliente_id
+                  and public.somente_digitos(numero_requerimento) = public.somente_digitos(l->>'numero_requerimento')
+                order by id limit 1;
+            elsif v_processo_id is null and l->>'tipo_beneficio' is not null then
+                select id into v_processo_id from public.processos
+                where cliente_id = v_cliente_id and tipo_beneficio = l->>'tipo_beneficio'
+                  and public.somente_digitos(numero_requerimento) = ''
+                order by id limit 1;
+            end if;
+
+            if v_processo_id is null then
+                insert into public.processos (cliente_id, tipo_beneficio, numero_requerimento, status_processo, esfera)
+                values (v_cliente_id, l->>'tipo_beneficio', l->>'numero_requerimento',
+                        coalesce(l->>'status_processo', 'Em Análise'), coalesce(l->>'esfera', 'Administrativo'));
+            else
+                update public.processos set
+                    tipo_beneficio = coalesce(l->>'tipo_beneficio', tipo_beneficio),
+                    numero_requerimento = coalesce(l->>'numero_requerimento', numero_requerimento),
+                    status_processo = coalesce(l->>'status_processo', status_processo),
+                    esfera = coalesce(l->>'esfera', esfera)
+                where id = v_processo_id;
+            end if;
+            v_processos := v_processos + 1;
+        end if;
+    end loop;
+
+    return jsonb_build_object('inseridos', v_inseridos, 'atualizados', v_atualizados, 'processos', v_processos);
+end;
+$$;
+
+-- p_linhas: [{"linha", "ocorrencia", "data_movimentacao", "tipo", "valor", "descricao",
+--             "forma_pagamento", "usuario_responsavel"}]
+-- ocorrencia: a n-ésima vez que o mesmo movimento (data, tipo, valor e descrição) aparece
+-- no arquivo inteiro, contada pelo app através dos blocos. A linha só entra se o caixa tiver
+-- menos de n movimentos iguais: reimportar a planilha não duplica nada, e movimentos
+-- repetidos de verdade entram todos, em qualquer bloco que caiam.
+-- Devolve {"inseridos", "ja_lancadas": [linha, ...]} (as ignoradas voltam como rejeitadas).
+drop function if exists public.importar_caixa(jsonb, text);
+create function public.importar_caixa(p_linhas jsonb, p_usuario text)
+returns jsonb
+language sql
+as $$
+    with novas as (
+        select (l->>'linha')::integer as linha,
+               (l->>'data_movimentacao')::timestamptz as data_movimentacao,
+               l->>'tipo' as tipo,
+               (l->>'valor')::numeric as valor,
+               l->>'descricao' as descricao,
+               l->>'forma_pagamento' as forma_pagamento,
+               coalesce(l->>'usuario_responsavel', p_usuario) as usuario_responsavel,
+               (l->>'ocorrencia')::integer as ocorrencia
+        from jsonb_array_elements(p_linhas) l
+    ),
+    marcadas as (
+        -- Contagem sobre o caixa de antes deste bloco (os blocos anteriores já contam)
+        select n.*, (select count(*) from public.caixa c
+                     where c.data_movimentacao = n.data_movimentacao and c.tipo = n.tipo
+                       and c.valor = n.valor and c.descricao is not distinct from n.descricao) >= n.ocorrencia as ja_lancada
+        from novas n
+    ),
+    inseridas as (
+        insert into public.caixa (data_movimentacao, tipo, valor, descricao, forma_pagamento, usuario_responsavel)
+        select data_movimentacao, tipo, valor, descricao, forma_pagamento, usuario_responsavel
+        from marcadas where not ja_lancada
+        returning 1
+    )
+    select jsonb_build_object(
+        'inseridos', (select count(*) from inseridas),
+        'ja_lancadas', coalesce((select jsonb_agg(linha order by linha) from marcadas where ja_lancada), '[]'::jsonb));
+$$;
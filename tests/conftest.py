@@ -0,0 +1,34 @@
+# Testes sobre o banco local (repositorio.BancoLocal, SQLite em memória), sem projeto Supabase:
+#   pip install pytest && python -m pytest
+import os
+import sys
+from datetime import date
+
+import pytest
+import streamlit as st
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+from benchmarks.bench_telas import BANCO, abrir, popular  # noqa: E402
+from repositorio import BancoLocal, Repositorio, banco_local  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def banco():
+    # O mesmo banco que o app abre pelo segredo BANCO_LOCAL, populado uma vez
+    banco = banco_local(BANCO)
+    popular(banco, 300, 1000, 400, date.today())
+    return banco
+
+
+@pytest.fixture
+def tela(banco):
+    # Cada teste começa com o cache do Streamlit vazio e a contagem de idas zerada
+    st.cache_data.clear(); banco.idas_ao_banco.clear()
+    return abrir
+
+
+@pytest.fixture
+def repo():
+    # Banco novo e vazio por teste (importação/exportação)
+    return Repositorio(BancoLocal())
@@ -0,0 +1,60 @@
+# Orçamento de idas ao banco por tela: uma consulta a mais numa tela é regressão.
+# As telas e interações são as do benchmark (benchmarks/bench_telas.py).
+import pytest
+
+from benchmarks.bench_telas import TELAS
+
+# Sessão nova com o cache do Streamlit vazio
+FRIO = {
+    "menu": {"resumo_lembretes": 1, "rpc:painel_indicadores": 1},
+    "busca": {"rpc:buscar_clientes": 1},
+    "agenda": {"rpc:alteracoes_agendamentos": 1, "agendamentos": 1},
+    "financeiro: fluxo de caixa": {"rpc:alteracoes_caixa": 1, "caixa": 1},
+    "financeiro: gestão & recibos": {"rpc:alteracoes_caixa": 1, "caixa": 1, "rpc:resumo_parcelas_pendentes": 1, "parcelas": 1},
+    "financeiro: novo contrato": {"rpc:alteracoes_caixa": 1, "caixa": 1, "clientes": 1, "processos": 1},
+    "financeiro: relatórios": {"rpc:alteracoes_caixa": 1, "caixa": 1, "rpc:saldo_caixa_ate": 1, "caixa_saldos_diarios": 1},
+    "cadastro": {"rpc:cadastrar_cliente_completo": 1},
+}
+# Outra sessão com o cache preenchido: só a carga da visão incremental da sessão e as escritas
+QUENTE = {
+    "menu": {},
+    "busca": {},
+    "agenda": {"rpc:alteracoes_agendamentos": 1, "agendamentos": 1},
+    "financeiro: fluxo de caixa": {"rpc:alteracoes_caixa": 1, "caixa": 1},
+    "financeiro: gestão & recibos": {"rpc:alteracoes_caixa": 1, "caixa": 1, "rpc:resumo_parcelas_pendentes": 1, "parcelas": 1},
+    "financeiro: novo contrato": {"rpc:alteracoes_caixa": 1, "caixa": 1},
+    "financeiro: relatórios": {"rpc:alteracoes_caixa": 1, "caixa": 1},
+    "cadastro": {"rpc:cadastrar_cliente_completo": 1},
+}
+
+
+def executar(banco, tela, pagina, interacao):
+    at = tela(pagina); banco.idas_ao_banco.clear()
+    interacao(at)
+    assert not at.exception, at.exception[0].value
+    return at, dict(banco.idas_ao_banco)
+
+
+@pytest.mark.parametrize("nome, pagina, interacao", TELAS, ids=[t[0] for t in TELAS])
+def test_idas_com_cache_frio(banco, tela, nome, pagina, interacao):
+    assert executar(banco, tela, pagina, interacao)[1] == FRIO[nome]
+
+
+@pytest.mark.parametrize("nome, pagina, interacao", TELAS, ids=[t[0] for t in TELAS])
+def test_idas_com_cache_quente(banco, tela, nome, pagina, interacao):
+    executar(banco, tela, pagina, interacao)
+    assert executar(banco, tela, pagina, interacao)[1] == QUENTE[nome]
+
+
+@pytest.mark.parametrize("pagina, esperado", [("agenda", {"rpc:alteracoes_agendamentos": 1}), ("financeiro", {"rpc:alteracoes_caixa": 1})])
+def test_rerun_da_sessao_busca_so_as_alteracoes(banco, tela, pagina, esperado):
+    at, _ = executar(banco, tela, pagina, lambda at: at.run())
+    banco.idas_ao_banco.clear(); at.run()
+    assert dict(banco.idas_ao_banco) == esperado
+
+
+def test_meus_dados_nao_volta_ao_banco_no_rerun(banco, tela):
+    at, idas = executar(banco, tela, "meus_dados", lambda at: at.run())
+    assert idas == {"usuarios": 1}
+    banco.idas_ao_banco.clear(); at.run()
+    assert dict(banco.idas_ao_banco) == {}
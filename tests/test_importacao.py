@@ -0,0 +1,73 @@
+# Importação e exportação de planilhas (importacao.py) sobre um banco local vazio
+import io
+
+import pytest
+from openpyxl import Workbook, load_workbook
+from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime
+
+import importacao as imp
+
+
+def planilha(texto, nome="p.csv", **kwargs):
+    return imp.ler_planilha(io.BytesIO(texto.encode()), nome, **kwargs)
+
+
+@pytest.mark.parametrize("formato", ["csv", "xlsx"])
+@pytest.mark.parametrize("tabela", ["clientes", "processos", "caixa"])
+def test_exportacao_aceita_pelo_download_button(repo, tabela, formato):
+    # O app passa exportar(...) como função ao download_button; o AppTest não a executa,
+    # então o tipo devolvido é conferido aqui com o conversor do próprio Streamlit
+    imp.importar(repo, "clientes", planilha("nome;cpf;tipo_beneficio\nAna;529.982.247-25;BPC/LOAS\n"), "admin")
+    imp.importar(repo, "caixa", planilha("data_movimentacao;tipo;valor\n01/10/2026;Entrada;50\n"), "admin")
+    dados, _ = convert_data_to_bytes_and_infer_mime(imp.exportar(repo.exportar(tabela), formato), RuntimeError("tipo não suportado"))
+    if formato == "csv": assert dados.decode("utf-8-sig").count("\n") == 2
+    else: assert len(list(load_workbook(io.BytesIO(dados), read_only=True).active.iter_rows(values_only=True))) == 2
+
+
+def test_exportacao_de_tabela_vazia(repo):
+    dados, _ = convert_data_to_bytes_and_infer_mime(imp.exportar(repo.exportar("caixa")), RuntimeError("tipo não suportado"))
+    assert dados == "﻿\r\n".encode()
+
+
+def contar(repo, tabela):
+    return repo.cliente.consultar(f"select count(*) n from {tabela}")[0]["n"]
+
+
+@pytest.mark.parametrize("formato", ["csv", "xlsx"])
+def test_caixa_exportado_e_reimportado_nao_duplica(repo, formato):
+    # Lançamentos do app têm microssegundos (datetime.now().isoformat()); o padrão do banco local, milissegundos
+    repo.lancar_caixa({"tipo": "Entrada", "valor": 150.0, "descricao": "Honorários", "usuario_responsavel": "admin", "data_movimentacao": "2026-10-18T10:15:30.123456"})
+    repo.lancar_caixa({"tipo": "Saída", "valor": 20.5, "descricao": "Luz", "usuario_responsavel": "admin"})
+    repo.lancar_caixa({"tipo": "Entrada", "valor": 80.0, "descricao": None, "usuario_responsavel": "admin", "data_movimentacao": "2026-10-18T00:00:00"})
+    arquivo = imp.exportar(repo.exportar("caixa"), formato)
+    totais, rejeitados = imp.importar(repo, "caixa", imp.ler_planilha(arquivo, f"caixa.{formato}"), "admin")
+    assert totais["inseridos"] == 0 and contar(repo, "caixa") == 3
+    assert set(rejeitados["motivo"]) == {imp.MOTIVO_JA_LANCADO}
+
+
+def test_caixa_com_fuso_horario(repo):
+    # Exportação do Postgres (timestamptz): "+00:00" no fim, com ou sem fração de segundo
+    texto = "data_movimentacao;tipo;valor;descricao\n2026-10-18T10:00:00+00:00;Entrada;50;A\n2026-10-18T07:00:00.25-03:00;Entrada;50;B\n"
+    totais, rejeitados = imp.importar(repo, "caixa", planilha(texto), "admin")
+    assert totais["inseridos"] == 2 and rejeitados.empty
+    assert [l["data_movimentacao"] for l in repo.exportar("caixa")] == ["2026-10-18T10:00:00", "2026-10-18T10:00:00.250000"]
+    assert imp.importar(repo, "caixa", planilha(texto), "admin")[0]["inseridos"] == 0
+
+
+def test_caixa_repetido_no_arquivo_entra_em_qualquer_bloco(repo):
+    texto = "data_movimentacao;tipo;valor;descricao\n" + "01/10/2026;Entrada;50;Consulta\n" * 3
+    assert imp.importar(repo, "caixa", planilha(texto, tamanho=2), "admin")[0]["inseridos"] == 3
+    assert imp.importar(repo, "caixa", planilha(texto, tamanho=1), "admin")[0]["inseridos"] == 0
+    assert contar(repo, "caixa") == 3
+
+
+def test_excel_com_numeros_e_celulas_vazias(repo):
+    # Uma célula vazia na coluna não pode transformar CPF e NB numéricos em "52998224725.0"
+    livro = Workbook(); aba = livro.active
+    aba.append(["nome", "cpf", "tipo_beneficio", "numero_requerimento"])
+    aba.append(["Ana", 52998224725, "BPC/LOAS", 1234567890])
+    aba.append(["Bia", None, "Pensão", None])
+    arquivo = io.BytesIO(); livro.save(arquivo); arquivo.seek(0)
+    totais, rejeitados = imp.importar(repo, "clientes", imp.ler_planilha(arquivo, "clientes.xlsx"), "admin")
+    assert totais["inseridos"] == 1 and rejeitados["linha"].tolist() == [3]
+    assert repo.cliente.consultar("select c.cpf, p.numero_requerimento from processos p join clientes c on c.id = p.cliente_id") == [{"cpf": "529.982.247-25", "numero_requerimento": "1234567890"}]
@@ -0,0 +1,96 @@
+# Worker de lembretes: roda separado do app Streamlit.
+#
+# A cada ciclo consulta, por intervalo e sobre índices, as perícias/avaliações dos
+# próximos dias (agendamentos.data_hora) e as parcelas vencidas e não pagas (índice
+# parcial de parcelas pendentes), e regrava a tabela resumo_lembretes numa transação.
+# O menu do app lê só esse resumo.
+#
+# Conecta direto no Postgres (string de conexão do projeto Supabase ou um Postgres local):
+#
+#   DATABASE_URL=postgresql://... python worker_lembretes.py              # a cada 15 min
+#   DATABASE_URL=postgresql://... python worker_lembretes.py --uma-vez    # um ciclo e sai
+import argparse
+import logging
+import os
+import time
+from datetime import date, timedelta
+
+import psycopg
+from psycopg.rows import dict_row
+
+DIAS_ANTECEDENCIA = 7
+INTERVALO_SEGUNDOS = 15 * 60
+
+log = logging.getLogger("lembretes")
+
+SQL_AGENDAMENTOS = """
+    select a.id, a.tipo_evento, a.data_hora, a.local_cidade, c.nome
+    from agendamentos a
+    join processos p on p.id = a.processo_id
+    join clientes c on c.id = p.cliente_id
+    where a.data_hora >= %(inicio)s and a.data_hora < %(fim)s
+      and (a.tipo_evento like 'Perícia%%' or a.tipo_evento like 'Avaliação%%')
+    order by a.data_hora, a.id
+"""
+
+SQL_PARCELAS_VENCIDAS = """
+    select pa.id, pa.valor_parcela, pa.data_vencimento, c.id as cliente_id, c.nome
+    from parcelas pa
+    join contratos ct on ct.id = pa.contrato_id
+    join processos p on p.id = ct.processo_id
+    join clientes c on c.id = p.cliente_id
+    where pa.data_pagamento is null and pa.data_vencimento < %(hoje)s
+    order by pa.data_vencimento, pa.id
+"""
+
+
+def montar_resumo(agendamentos, parcelas):
+    # Função pura: devolve as linhas do resumo (tipo, data, cliente, descricao, quantidade, valor).
+    # Agendamentos entram um a um; parcelas vencidas são agrupadas por cliente,
+    # com a data do vencimento mais antigo.
+    linhas = [("agendamento", a['data_hora'], a['nome'], " - ".join(filter(None, [a['tipo_evento'], a['local_cidade']])), 1, None) for a in agendamentos]
+    por_cliente = {}
+    for p in parcelas:
+        nome, venc, qtd, total = por_cliente.get(p['cliente_id'], (p['nome'], p['data_vencimento'], 0, 0))
+        por_cliente[p['cliente_id']] = (nome, min(venc, p['data_vencimento']), qtd + 1, total + p['valor_parcela'])
+    for nome, venc, qtd, total in sorted(por_cliente.values(), key=lambda item: item[1]):
+        linhas.append(("parcela", venc, nome, f"{qtd} parcela(s) vencida(s)", qtd, total))
+    return linhas
+
+
+def atualizar_resumo(con, hoje=None, dias=DIAS_ANTECEDENCIA):
+    hoje = hoje or date.today()
+    with con.cursor(row_factory=dict_row) as cur:
+        agendamentos = cur.execute(SQL_AGENDAMENTOS, {"inicio": hoje, "fim": hoje + timedelta(days=dias + 1)}).fetchall()
+        parcelas = cur.execute(SQL_PARCELAS_VENCIDAS, {"hoje": hoje}).fetchall()
+    linhas = montar_resumo(agendamentos, parcelas)
+    # Troca o resumo inteiro de uma vez: quem lê durante a gravação vê o resumo anterior
+    with con.transaction(), con.cursor() as cur:
+        cur.execute("delete from resumo_lembretes")
+        cur.executemany("insert into resumo_lembretes (tipo, data, cliente, descricao, quantidade, valor) values (%s, %s, %s, %s, %s, %s)", linhas)
+    log.info("%d agendamento(s) e %d parcela(s) vencida(s) no resumo", len(agendamentos), len(parcelas))
+    return linhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera o resumo de lembretes lido pelo menu do app.")
+    parser.add_argument("--uma-vez", action="store_true", help="executa um ciclo e sai")
+    parser.add_argument("--intervalo", type=int, default=INTERVALO_SEGUNDOS, help="segundos entre ciclos")
+    parser.add_argument("--dias", type=int, default=DIAS_ANTECEDENCIA, help="dias à frente para perícias/avaliações")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    dsn = os.environ["DATABASE_URL"]
+    while True:
+        try:
+            with psycopg.connect(dsn, autocommit=True) as con:
+                atualizar_resumo(con, dias=args.dias)
+        except psycopg.Error:
+            # Falha de um ciclo (rede, banco fora do ar) não derruba o worker
+            if args.uma_vez: raise
+            log.exception("Falha ao atualizar o resumo de lembretes")
+        if args.uma_vez: break
+        time.sleep(args.intervalo)
+
+
+if __name__ == "__main__":
+    main()